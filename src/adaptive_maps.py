@@ -0,0 +1,206 @@
+"""
+This module generates category maps adaptively. A coarse map is calculated
+first, and only the cells close to the transitions are refined, so the
+cost of a sharp transition is proportional to its length instead of to
+the area of the map
+"""
+import numpy as np
+
+from config import Config
+from evaluation import EvaluationContext
+import parse_maps
+
+
+class AdaptiveMap:
+    """
+    hierarchical category map. The map is defined on a fine lattice of
+    velocities, but only the points close to the transitions are calculated.
+    The cells whose corners all have the same category are stored as leaves
+    covering a whole block of the lattice
+    """
+
+    def __init__(self, u_gs_axis, u_ls_axis, leaves, points):
+        # the velocities of the fine lattice
+        self.u_gs_axis = u_gs_axis
+        self.u_ls_axis = u_ls_axis
+
+        # leaves as (u_ls index, u_gs index, size, category) of the
+        # block of lattice points that they cover
+        self.leaves = leaves
+
+        # the lattice points that have been calculated
+        # as (u_ls index, u_gs index, category)
+        self.points = points
+
+    @property
+    def evaluated_points(self):
+        """number of lattice points at which the conditions were calculated"""
+        return self.points[0].size
+
+    def velocity_maps(self, step=1, sparse=False):
+        """the u_gs and u_ls maps of the lattice rasterized every step points,
+        sparse like in generate_data.generate_velocity_maps if sparse
+        """
+        u_gs_array = self.u_gs_axis[::step]
+        u_ls_array = self.u_ls_axis[::step]
+        if sparse:
+            return u_gs_array[np.newaxis, :], u_ls_array[:, np.newaxis]
+
+        u_gs_map = np.tile(u_gs_array, (u_ls_array.size, 1))
+        u_ls_map = np.tile(u_ls_array, (u_gs_array.size, 1)).T
+
+        return u_gs_map, u_ls_map
+
+    def rasterize(self, step=1):
+        """get the category map on the lattice points every step points,
+        in the same format as parse_maps.get_categories_maps
+        """
+        rows = np.arange(0, self.u_ls_axis.size, step)
+        cols = np.arange(0, self.u_gs_axis.size, step)
+        category_map = np.full(
+            (rows.size, cols.size), Config.NO_CATEGORY, dtype=np.uint8
+        )
+
+        # paint each leaf over the raster points it covers
+        leaf_i, leaf_j, leaf_size, leaf_category = self.leaves
+        row_start = np.searchsorted(rows, leaf_i)
+        row_stop = np.searchsorted(rows, leaf_i + leaf_size, side="right")
+        col_start = np.searchsorted(cols, leaf_j)
+        col_stop = np.searchsorted(cols, leaf_j + leaf_size, side="right")
+        for r_0, r_1, c_0, c_1, category in zip(
+            row_start, row_stop, col_start, col_stop, leaf_category
+        ):
+            category_map[r_0:r_1, c_0:c_1] = category
+
+        # the calculated points are exact
+        point_i, point_j, point_category = self.points
+        on_raster = (point_i % step == 0) & (point_j % step == 0)
+        category_map[
+            point_i[on_raster] // step, point_j[on_raster] // step
+        ] = point_category[on_raster]
+
+        return category_map
+
+
+def generate_adaptive_map(
+    liquid,
+    gas,
+    pipe,
+    coarse_datapoints=33,
+    levels=4,
+    min_u_ls=Config.MIN_ULS,
+    max_u_ls=Config.MAX_ULS,
+    min_u_gs=Config.MIN_UGS,
+    max_u_gs=Config.MAX_UGS,
+):
+    """calculate a coarse map and refine it levels times close to the
+    transitions, each level halving the size of the cells whose corners
+    disagree.
+
+    The resulting map has (coarse_datapoints - 1) * 2 ** levels + 1 points
+    per axis. Regions that are smaller than a coarse cell and don't touch
+    any coarse point may be missed
+    """
+    # the fine lattice
+    step = 2 ** levels
+    datapoints = (coarse_datapoints - 1) * step + 1
+    u_gs_axis = np.geomspace(min_u_gs, max_u_gs, num=datapoints)
+    u_ls_axis = np.geomspace(min_u_ls, max_u_ls, num=datapoints)
+
+    # calculate the coarse map
+    coarse_index = np.arange(0, datapoints, step)
+    u_gs_map = np.tile(u_gs_axis[coarse_index], (coarse_index.size, 1))
+    u_ls_map = np.tile(u_ls_axis[coarse_index], (coarse_index.size, 1)).T
+    coarse_context = EvaluationContext(u_gs_map, u_ls_map, liquid, gas, pipe)
+    coarse_map = parse_maps.get_categories_maps(
+        u_gs_map, u_ls_map, liquid, gas, pipe, context=coarse_context
+    )
+
+    # the calculated points, stored by their flat lattice index
+    index_i, index_j = np.meshgrid(coarse_index, coarse_index, indexing="ij")
+    keys = (index_i * datapoints + index_j).ravel()
+    values = coarse_map.ravel()
+    order = np.argsort(keys)
+    keys, values = keys[order], values[order]
+
+    def classify(new_keys):
+        """calculate the categories of lattice points with the same batch
+        dependent values as the coarse map
+        """
+        u_gs = u_gs_axis[new_keys % datapoints][np.newaxis, :]
+        u_ls = u_ls_axis[new_keys // datapoints][np.newaxis, :]
+        context = EvaluationContext(
+            u_gs,
+            u_ls,
+            liquid,
+            gas,
+            pipe,
+            maximum_u_gs=coarse_context.maximum_u_gs,
+            bubbly_present=coarse_context.bubbly_present,
+        )
+        return parse_maps.get_categories_maps(
+            u_gs, u_ls, liquid, gas, pipe, context=context
+        )[0]
+
+    def lookup(i, j):
+        """the categories of calculated lattice points"""
+        return values[np.searchsorted(keys, i * datapoints + j)]
+
+    # the cells of the coarse map as (u_ls index, u_gs index)
+    cell_i, cell_j = index_i[:-1, :-1].ravel(), index_j[:-1, :-1].ravel()
+    size = step
+
+    leaves_i, leaves_j, leaves_size, leaves_category = [], [], [], []
+    while True:
+        # check which cells have the same category in every corner
+        corners = np.stack(
+            [
+                lookup(cell_i, cell_j),
+                lookup(cell_i + size, cell_j),
+                lookup(cell_i, cell_j + size),
+                lookup(cell_i + size, cell_j + size),
+            ]
+        )
+        uniform = np.all(corners == corners[0], axis=0)
+
+        # the uniform cells are not refined anymore
+        leaves_i.append(cell_i[uniform])
+        leaves_j.append(cell_j[uniform])
+        leaves_size.append(np.full(uniform.sum(), size))
+        leaves_category.append(corners[0][uniform])
+        cell_i, cell_j = cell_i[~uniform], cell_j[~uniform]
+
+        if size == 1 or cell_i.size == 0:
+            break
+
+        # calculate the midpoints of the cells that are refined
+        half = size // 2
+        new_i = np.concatenate(
+            [cell_i + half, cell_i, cell_i + half, cell_i + size, cell_i + half]
+        )
+        new_j = np.concatenate(
+            [cell_j, cell_j + half, cell_j + half, cell_j + half, cell_j + size]
+        )
+        new_keys = np.unique(new_i * datapoints + new_j)
+        new_keys = new_keys[~np.isin(new_keys, keys)]
+
+        if new_keys.size > 0:
+            keys = np.append(keys, new_keys)
+            values = np.append(values, classify(new_keys))
+            order = np.argsort(keys)
+            keys, values = keys[order], values[order]
+
+        # split every cell into four children
+        cell_i = np.concatenate([cell_i, cell_i + half, cell_i, cell_i + half])
+        cell_j = np.concatenate([cell_j, cell_j, cell_j + half, cell_j + half])
+        size = half
+
+    leaves = (
+        np.concatenate(leaves_i),
+        np.concatenate(leaves_j),
+        np.concatenate(leaves_size),
+        np.concatenate(leaves_category),
+    )
+    points = (keys // datapoints, keys % datapoints, values)
+
+    return AdaptiveMap(u_gs_axis, u_ls_axis, leaves, points)
@@ -0,0 +1,582 @@
+"""
+This module times the alternative implementations of the calculations
+against each other, on the default fluids of main, and runs the benchmark
+suite of every stage of the map generation, whose results are written to
+json files so that versions can be compared
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from config import Config
+import equations
+from evaluation import EvaluationContext, WarmStart
+import fluids
+from general import friction_factor
+import generate_data
+from instrumentation import Instrumentation
+import parse_maps
+from workspace import default_workspace
+
+
+def default_scenario(inclination=0):
+    """the liquid, gas and pipe of main"""
+    liquid = fluids.Liquid(
+        density=998,
+        bubble_surface_tension=0.073,
+        mass_flowrate=1.8,
+        dynamic_viscosity=8.9e-4,
+    )
+    gas = fluids.Gas(density=1.225, mass_flowrate=0.2, dynamic_viscosity=18.3e-6)
+    pipe = fluids.Pipe(diameter=0.3, inclination=inclination, roughness=0.001)
+    return liquid, gas, pipe
+
+
+def best_time(func, repeat=5):
+    """the fastest of repeat calls of func, in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark_friction_backends(points=10 ** 6, repeat=5, seed=0):
+    """compare the friction factor backends against the exact colebrook
+    solution on log uniform turbulent reynolds numbers from 4e3 to 1e8,
+    where colebrook is valid, with a single pipe roughness and with a
+    random roughness per point.
+
+    Returns a list of [backend, roughness, max relative deviation, 99th
+    percentile of the relative deviation, million points per second] rows
+    """
+    rng = np.random.default_rng(seed)
+    reynolds = 10 ** rng.uniform(np.log10(4e3), 8, points)
+    roughnesses = {
+        "single": 0.001,
+        "random": 10 ** rng.uniform(-6, -1.5, points),
+    }
+
+    rows = []
+    with np.errstate(all="ignore"):
+        for case, roughness in roughnesses.items():
+            reference = friction_factor.darcy(reynolds, roughness, "colebrook")
+            for backend in ["explicit", "colebrook", "table"]:
+                friction = friction_factor.darcy(reynolds, roughness, backend)
+                seconds = best_time(
+                    lambda: friction_factor.darcy(reynolds, roughness, backend),
+                    repeat,
+                )
+                deviation = np.abs(friction / reference - 1)
+                rows.append(
+                    [
+                        backend,
+                        case,
+                        np.nanmax(deviation),
+                        np.nanpercentile(deviation, 99),
+                        points / seconds / 1e6,
+                    ]
+                )
+    return rows
+
+
+def peak_memory(func):
+    """the peak memory allocated during a call of func, in bytes, not
+    counting the memory allocated before the call
+    """
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def benchmark_peak_memory(sizes=(100, 300, 1000), inclination=10):
+    """measure the peak memory of get_categories_maps on maps of datapoints
+    by datapoints points, on the first call, which fills the default
+    workspace, and on a repeated call, which reuses its buffers.
+
+    Returns a list of [datapoints, first call MB, repeated call MB, workspace
+    MB, repeated call peak in multiples of one float map] rows
+    """
+    liquid, gas, pipe = default_scenario(inclination)
+    workspace = default_workspace()
+
+    rows = []
+    with np.errstate(all="ignore"):
+        for datapoints in sizes:
+            u_gs, u_ls = generate_data.generate_velocity_maps(datapoints=datapoints)
+            workspace.clear()
+
+            def categories_maps():
+                parse_maps.get_categories_maps(u_gs, u_ls, liquid, gas, pipe)
+
+            first = peak_memory(categories_maps)
+            repeated = peak_memory(categories_maps)
+            rows.append(
+                [
+                    datapoints,
+                    first / 1e6,
+                    repeated / 1e6,
+                    workspace.nbytes / 1e6,
+                    repeated / u_gs.nbytes,
+                ]
+            )
+    workspace.clear()
+    return rows
+
+
+def benchmark_warm_start(datapoints=150, inclinations=range(-90, 91)):
+    """calculate the maps of a sweep of the inclination of the default
+    scenario, in degrees, on their own and warm started from the previous
+    map, and check that they are the same.
+
+    Returns a list of [mode, seconds, mean annular iterations, different
+    cells] rows, with the cells of the warm started maps that differ from
+    the ones calculated on their own
+    """
+    liquid, gas, pipe = default_scenario()
+    u_gs, u_ls = generate_data.generate_velocity_maps(
+        datapoints=datapoints, sparse=True
+    )
+
+    rows = []
+    cold_maps = None
+    with np.errstate(all="ignore"):
+        for mode in ["cold", "warm"]:
+            warm_start = WarmStart() if mode == "warm" else None
+            instrument = Instrumentation()
+            start = time.perf_counter()
+            maps = []
+            for inclination in inclinations:
+                inclined = fluids.select_scenario(pipe, 0)
+                inclined.inclination = inclination * np.pi / 180
+                maps.append(
+                    parse_maps.get_categories_maps(
+                        u_gs,
+                        u_ls,
+                        liquid,
+                        gas,
+                        inclined,
+                        instrumentation=instrument,
+                        warm_start=warm_start,
+                    )
+                )
+            seconds = time.perf_counter() - start
+            maps = np.array(maps)
+            if cold_maps is None:
+                cold_maps = maps
+            solves = [
+                solve
+                for solve in instrument.report()["solves"]
+                if solve["name"] == "liquid_instability"
+            ]
+            iterations = sum(
+                solve["mean_iterations"] * solve["points"] for solve in solves
+            ) / sum(solve["points"] for solve in solves)
+            rows.append(
+                [mode, seconds, iterations, int(np.count_nonzero(maps != cold_maps))]
+            )
+    return rows
+
+
+# the seconds that importing a module of the calculations may take, in a
+# new interpreter and without the optional dependencies
+IMPORT_TIME_BUDGET = 0.25
+# the dependencies that the calculations must not import
+OPTIONAL_DEPENDENCIES = ("matplotlib", "scipy")
+# the plotting modules, which are expected to import them
+PLOTTING_MODULES = ("visualization", "map_animation")
+
+
+def import_time(module, repeat=5):
+    """the fastest import of module in a new interpreter, in seconds, and
+    the optional dependencies that it imported
+    """
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "seconds = time.perf_counter() - start\n"
+        f"optional = {OPTIONAL_DEPENDENCIES!r}\n"
+        "loaded = [name for name in optional if name in sys.modules]\n"
+        "print(json.dumps([seconds, loaded]))\n"
+    )
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        seconds, loaded = json.loads(output)
+        times.append(seconds)
+    return min(times), loaded
+
+
+def benchmark_import_time(
+    modules=(
+        "parse_maps",
+        "map_cache",
+        "map_atlas",
+        "sweep",
+        "visualization",
+        "map_animation",
+    ),
+    repeat=5,
+):
+    """time the imports of the modules against IMPORT_TIME_BUDGET.
+    The plotting modules are expected to load matplotlib, so they are not
+    held to the budget. The other modules are over the budget if they load
+    any optional dependency, however fast.
+
+    Returns a list of [module, seconds, optional dependencies, within budget]
+    rows
+    """
+    rows = []
+    for module in modules:
+        seconds, loaded = import_time(module, repeat)
+        if module in PLOTTING_MODULES:
+            within_budget = True
+        else:
+            within_budget = not loaded and seconds <= IMPORT_TIME_BUDGET
+        rows.append([module, seconds, ", ".join(loaded), within_budget])
+    return rows
+
+
+# the map sizes of the end to end benchmarks of the suite
+SUITE_SIZES = (100, 300, 1000, 3000)
+# the friction correlations that take arrays of reynolds numbers
+FRICTION_CORRELATIONS = (
+    "turb_swamee",
+    "bnt",
+    "fang",
+    "niazkar",
+    "churchill",
+    "niazkar_and_churchill",
+    "colebrook",
+    "ak",
+    "bkc",
+    "ept",
+)
+
+
+def benchmark_suite(
+    sizes=SUITE_SIZES,
+    stage_datapoints=300,
+    plot_sizes=(100, 300),
+    friction_points=10 ** 6,
+    repeat=3,
+):
+    """time every stage of the map generation on the default scenario at 10
+    degrees: the velocity maps, every parse function, every friction
+    correlation, the newton solves of the annular holdup and the stratified
+    critical height, get_categories_maps end to end and plot_map.
+
+    The parse functions get a new evaluation context on every call, so each
+    of them is timed together with the intermediate values it needs.
+
+    Returns the results as a dict with the environment and a list of
+    {"group", "name", "points", "seconds"} entries, the best of repeat calls
+    """
+    liquid, gas, pipe = default_scenario(inclination=10)
+    results = []
+
+    def record(group, name, points, func):
+        results.append(
+            {
+                "group": group,
+                "name": name,
+                "points": int(points),
+                "seconds": best_time(func, repeat),
+            }
+        )
+
+    with np.errstate(all="ignore"):
+        for datapoints in sizes:
+            record(
+                "velocity maps",
+                "generate_velocity_maps",
+                datapoints ** 2,
+                lambda: generate_data.generate_velocity_maps(datapoints=datapoints),
+            )
+
+        # the parse functions on a fresh context each
+        u_gs, u_ls = generate_data.generate_velocity_maps(datapoints=stage_datapoints)
+        for name in [
+            "parse_bubbly",
+            "parse_dispersed_bubble",
+            "parse_stratified",
+            "parse_annular",
+            "parse_elongated_bubble",
+            "parse_churn",
+        ]:
+            parse = getattr(parse_maps, name)
+            record(
+                "parse",
+                name,
+                u_gs.size,
+                lambda: parse(
+                    u_gs,
+                    u_ls,
+                    liquid,
+                    gas,
+                    pipe,
+                    EvaluationContext(u_gs, u_ls, liquid, gas, pipe),
+                ),
+            )
+
+        # the friction correlations on turbulent reynolds numbers
+        reynolds = 10 ** np.random.default_rng(0).uniform(
+            np.log10(4e3), 8, friction_points
+        )
+        for name in FRICTION_CORRELATIONS:
+            correlation = getattr(friction_factor, name)
+            record(
+                "friction",
+                name,
+                friction_points,
+                lambda: correlation(reynolds, pipe.roughness),
+            )
+        record(
+            "friction",
+            "table",
+            friction_points,
+            lambda: friction_factor.friction_table().lookup(reynolds, pipe.roughness),
+        )
+
+        # the newton solves, with their inputs calculated before timing
+        context = EvaluationContext(u_gs, u_ls, liquid, gas, pipe)
+        y_grav, x_sqrd = context.y_grav, context.x_sqrd
+        record(
+            "solver",
+            "annular liquid_holdup",
+            u_gs.size,
+            lambda: equations.annular.liquid_holdup(u_gs, u_ls, y_grav, x_sqrd),
+        )
+        for separable in [True, False]:
+            record(
+                "solver",
+                "stratified critical_height" + ("" if separable else " full"),
+                u_gs.size,
+                lambda: equations.stratified.critical_height(
+                    u_gs, liquid, gas, pipe, separable=separable
+                ),
+            )
+
+        for datapoints in sizes:
+            u_gs, u_ls = generate_data.generate_velocity_maps(datapoints=datapoints)
+            record(
+                "end to end",
+                "get_categories_maps",
+                u_gs.size,
+                lambda: parse_maps.get_categories_maps(u_gs, u_ls, liquid, gas, pipe),
+            )
+            u_gs, u_ls = generate_data.generate_velocity_maps(
+                datapoints=datapoints, sparse=True
+            )
+            record(
+                "end to end",
+                "get_categories_maps sparse",
+                datapoints ** 2,
+                lambda: parse_maps.get_categories_maps(u_gs, u_ls, liquid, gas, pipe),
+            )
+        default_workspace().clear()
+
+        for datapoints in plot_sizes:
+            u_gs, u_ls = generate_data.generate_velocity_maps(datapoints=datapoints)
+            category_map = parse_maps.get_categories_maps(u_gs, u_ls, liquid, gas, pipe)
+            record(
+                "plot",
+                "plot_map",
+                u_gs.size,
+                lambda: render_map(category_map, liquid, gas, pipe, u_gs, u_ls),
+            )
+            record(
+                "plot",
+                "plot_map raster",
+                u_gs.size,
+                lambda: render_map(
+                    category_map, liquid, gas, pipe, u_gs, u_ls, raster=True
+                ),
+            )
+
+    return {"environment": environment(), "results": results}
+
+
+def render_map(category_map, liquid, gas, pipe, u_gs, u_ls, raster=False):
+    """plot a map and render it to png, so the drawing is timed too"""
+    import matplotlib.pyplot as plt
+    import visualization
+
+    fig, _ = visualization.plot_map(
+        category_map, liquid, gas, pipe, u_gs, u_ls, raster=raster
+    )
+    fig.savefig(io.BytesIO(), format="png")
+    plt.close(fig)
+
+
+def environment():
+    """the versions and machine that the results were measured on"""
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "friction_backend": Config.FRICTION_BACKEND,
+    }
+
+
+def write_results(path, results):
+    """write the results of benchmark_suite to a json file"""
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
+
+
+def read_results(path):
+    """read the results of benchmark_suite from a json file"""
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare_results(baseline, current, tolerance=0.1):
+    """compare the benchmarks that both results have in common.
+
+    Returns a list of [group, name, points, baseline seconds, current
+    seconds, ratio, regression] rows, where regression means the current
+    time is more than tolerance slower than the baseline
+    """
+    baseline_times = {
+        (entry["group"], entry["name"], entry["points"]): entry["seconds"]
+        for entry in baseline["results"]
+    }
+    rows = []
+    for entry in current["results"]:
+        key = (entry["group"], entry["name"], entry["points"])
+        if key not in baseline_times:
+            continue
+        ratio = entry["seconds"] / baseline_times[key]
+        rows.append(
+            [*key, baseline_times[key], entry["seconds"], ratio, ratio > 1 + tolerance]
+        )
+    return rows
+
+
+def print_reports():
+    """print the tables of the comparisons of the implementations"""
+    table_format = "|{:<10} | {:<9} | {:>9} | {:>9} | {:>8}|"
+    print("FRICTION BACKENDS (deviation from colebrook)")
+    print(table_format.format("BACKEND", "ROUGHNESS", "MAX", "99%", "MPTS/S"))
+    print("-" * 59)
+    for backend, case, maximum, percentile, throughput in benchmark_friction_backends():
+        print(
+            table_format.format(
+                backend,
+                case,
+                f"{maximum:.2e}",
+                f"{percentile:.2e}",
+                f"{throughput:.1f}",
+            )
+        )
+
+    table_format = "|{:>6} | {:>9} | {:>9} | {:>9} | {:>6}|"
+    print("PEAK MEMORY OF THE CATEGORY MAPS")
+    print(table_format.format("POINTS", "FIRST MB", "REPEAT MB", "WORKSP MB", "MAPS"))
+    print("-" * 53)
+    for datapoints, first, repeated, held, maps in benchmark_peak_memory():
+        print(
+            table_format.format(
+                f"{datapoints}^2",
+                f"{first:.1f}",
+                f"{repeated:.1f}",
+                f"{held:.1f}",
+                f"{maps:.1f}",
+            )
+        )
+
+    table_format = "|{:<5} | {:>8} | {:>10} | {:>9}|"
+    print("WARM STARTED SWEEP OF THE INCLINATION")
+    print(table_format.format("MODE", "TIME [s]", "ITERATIONS", "DIFFERENT"))
+    print("-" * 43)
+    for mode, seconds, iterations, different in benchmark_warm_start():
+        print(
+            table_format.format(mode, f"{seconds:.2f}", f"{iterations:.2f}", different)
+        )
+
+    table_format = "|{:<14} | {:>8} | {:<17} | {:>6}|"
+    print(f"IMPORT TIME (budget {IMPORT_TIME_BUDGET} s)")
+    print(table_format.format("MODULE", "TIME [s]", "OPTIONAL IMPORTS", "BUDGET"))
+    print("-" * 56)
+    for module, seconds, loaded, within_budget in benchmark_import_time():
+        print(
+            table_format.format(
+                module,
+                f"{seconds:.3f}",
+                loaded,
+                "ok" if within_budget else "over",
+            )
+        )
+
+
+def print_comparison(rows):
+    """print the rows of compare_results"""
+    table_format = "|{:<13} | {:<28} | {:>8} | {:>9} | {:>9} | {:>5}|"
+    print(table_format.format("GROUP", "NAME", "POINTS", "BEFORE", "AFTER", "RATIO"))
+    print("-" * 90)
+    for group, name, points, before, after, ratio, regression in rows:
+        print(
+            table_format.format(
+                group,
+                name,
+                points,
+                f"{before:.4f}",
+                f"{after:.4f}",
+                f"{ratio:.2f}",
+            )
+            + (" slower" if regression else "")
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--suite", metavar="FILE", help="run the suite and write its results to FILE"
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="FILE",
+        help="compare the results of the suite with the earlier results in FILE",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=SUITE_SIZES,
+        help="the datapoints of the end to end maps of the suite",
+    )
+    arguments = parser.parse_args()
+
+    if arguments.suite is None and arguments.compare is None:
+        print_reports()
+    else:
+        results = benchmark_suite(sizes=arguments.sizes)
+        if arguments.suite is not None:
+            write_results(arguments.suite, results)
+        if arguments.compare is not None:
+            print_comparison(compare_results(read_results(arguments.compare), results))
@@ -3,60 +3,47 @@ the functions that define the conditions for flow to be considered
 annular flow
 """
 import numpy as np
-from scipy.optimize import newton
-import general
 import equations
+from evaluation import EvaluationContext
 
 
-def liquid_stability(u_gs, u_ls, liquid, gas, pipe):
+def liquid_stability(u_gs, u_ls, liquid, gas, pipe, context=None):
     """find the locations at which the films stability condition is met"""
+    if context is None:
+        context = EvaluationContext(u_gs, u_ls, liquid, gas, pipe)
 
     # get the non dimensional values
-    x_sqrd = general.lockhart_martinelli(u_gs, u_ls, liquid, gas, pipe) ** 2
-    y_grav = general.y_gravity(u_gs, u_ls, liquid, gas, pipe)
+    x_sqrd = context.x_sqrd
+    y_grav = context.y_grav
 
-    # iterate to find the holdup
-    initial_alpha_l = 1 - u_gs / (u_ls + u_gs)
-    liquid_holdup = newton(
-        equations.annular.liquid_instability,
-        initial_alpha_l,
-        args=(
-            y_grav,
-            x_sqrd,
-        ),
+    # iterate to find the holdup, and get rid of nonsensical values
+    liquid_holdup = np.clip(
+        context.annular_holdup, 0, 1, out=context.empty(context.annular_holdup)
     )
 
-    # get rid of nonsensical values
-    liquid_holdup[liquid_holdup < 0] = 0
-    liquid_holdup[liquid_holdup > 1] = 1
-
     # calculate the condition
     rhs = equations.annular.equation16_barnea1987(liquid_holdup, x_sqrd)
+    context.discard(liquid_holdup)
 
     # the condition
     return y_grav < rhs
 
 
-def gas_core_blockage(u_gs, u_ls, liquid, gas, pipe):
+def gas_core_blockage(u_gs, u_ls, liquid, gas, pipe, context=None):
     """
     find the locations in which the gas core is expercted to not be blocked
     """
-    # get the non dimensional values
-    x_sqrd = general.lockhart_martinelli(u_gs, u_ls, liquid, gas, pipe) ** 2
-    y_grav = general.y_gravity(u_gs, u_ls, liquid, gas, pipe)
+    if context is None:
+        context = EvaluationContext(u_gs, u_ls, liquid, gas, pipe)
 
     # iterate to find the holdup
-    initial_alpha_l = 1 - u_gs / (u_ls + u_gs)
-    liquid_holdup = newton(
-        equations.annular.liquid_instability,
-        initial_alpha_l,
-        args=(
-            y_grav,
-            x_sqrd,
-        ),
-    )
+    liquid_holdup = context.empty(context.annular_holdup)
+    liquid_holdup[...] = context.annular_holdup
+
     # get rid of nonsensical values
     liquid_holdup[(liquid_holdup < 0) | (liquid_holdup > 1)] = np.nan
     r_sm = 0.48
 
-    return liquid_holdup / r_sm < 0.5
+    not_blocked = np.divide(liquid_holdup, r_sm, out=liquid_holdup) < 0.5
+    context.discard(liquid_holdup)
+    return not_blocked
@@ -3,10 +3,8 @@ the functions that define the conditions for flow to be considered
 dispersed bubble flow
 """
 import numpy as np
-import general.friction_factor as friction_factor
-import general
 import equations.dispersed_bubbles
-import fluids
+from evaluation import EvaluationContext
 
 
 def gas_void_fraction(u_gs, u_ls, critical_value=0.35):
@@ -18,44 +16,67 @@ def gas_void_fraction(u_gs, u_ls, critical_value=0.35):
     return u_ls > u_gs * (1 - critical_value) / critical_value
 
 
-def bubble_coalescence(u_gs, u_ls, liquid, gas, pipe):
+def bubble_coalescence(u_gs, u_ls, liquid, gas, pipe, context=None):
     """check if the bubbles are large enough to coalesce into
     slugs with consideration for angle
      Barnea 1980
     """
+    if context is None:
+        context = EvaluationContext(u_gs, u_ls, liquid, gas, pipe)
 
     # local variables for readability
-    roughness = pipe.roughness
     sigma = liquid.bubble_surface_tension
     rho_l = liquid.density
+    rho_g = gas.density
     diam = pipe.diameter
 
+    # get the mixture velocity
+    u_mix = context.u_mix
+
+    # mixture friction factor
+    fric_mix = context.friction_mix
+
     # calculate the lhs
     deformed_bubble_size = equations.dispersed_bubbles.deformed_bubble_critical_size(
         liquid, gas, pipe
     )
     migration_to_top_size = equations.dispersed_bubbles.migration_to_top_critical_size(
-        u_gs, u_ls, liquid, gas, pipe
+        u_gs,
+        u_ls,
+        liquid,
+        gas,
+        pipe,
+        mix=context.mix,
+        friction_mix=fric_mix,
+        out=context.empty(
+            u_mix, fric_mix, rho_l, rho_g, pipe.gravity, pipe.inclination
+        ),
     )
     # make the array
-    bubble_crit_diam = np.minimum(migration_to_top_size, deformed_bubble_size)
-
-    # get the mixture values
-    mix = fluids.Mix(u_gs, u_ls, liquid, gas, pipe)
-    # get the mixture velocity
-    u_mix = mix.mixture_velocity(u_gs, u_ls)
-
-    # mixture reynolds number
-    reynolds_mix = general.reynolds(u_mix, mix, pipe)
-
-    # mixture friction factor
-    fric_mix = friction_factor.fang(reynolds_mix, roughness)
+    bubble_crit_diam = np.minimum(
+        migration_to_top_size, deformed_bubble_size, out=migration_to_top_size
+    )
 
-    # get the terms for readability
-    rhs_1 = 0.725 + 4.15 * np.sqrt(u_gs / u_mix)
+    # get the terms for readability, in buffers of the context
+    # rhs_1 = 0.725 + 4.15 * np.sqrt(u_gs / u_mix)
+    rhs_1 = np.divide(u_gs, u_mix, out=context.empty(u_gs, u_mix))
+    np.sqrt(rhs_1, out=rhs_1)
+    np.multiply(4.15, rhs_1, out=rhs_1)
+    np.add(0.725, rhs_1, out=rhs_1)
     rhs_2 = (sigma / rho_l) ** (3 / 5)
-    rhs_3 = ((2 * fric_mix / diam) * (u_mix ** 3)) ** (-2 / 5)
-    rhs = rhs_1 * rhs_2 * rhs_3
+    # rhs_3 = ((2 * fric_mix / diam) * (u_mix ** 3)) ** (-2 / 5)
+    rhs_3 = np.multiply(2, fric_mix, out=context.empty(fric_mix, diam, u_mix))
+    np.divide(rhs_3, diam, out=rhs_3)
+    u_mix_cubed = np.power(u_mix, 3, out=context.empty(u_mix))
+    np.multiply(rhs_3, u_mix_cubed, out=rhs_3)
+    context.discard(u_mix_cubed)
+    np.power(rhs_3, -2 / 5, out=rhs_3)
+    # rhs = rhs_1 * rhs_2 * rhs_3
+    rhs = np.multiply(rhs_1, rhs_2, out=context.empty(rhs_1, rhs_2, rhs_3))
+    np.multiply(rhs, rhs_3, out=rhs)
+    context.discard(rhs_1, rhs_3)
 
     # check if the bubbles are few/small enough that they won't coalesce
-    return bubble_crit_diam > rhs
+    coalescence = bubble_crit_diam > rhs
+    context.discard(bubble_crit_diam, rhs)
+    return coalescence
@@ -2,32 +2,42 @@
 the functions that define the conditions for flow to be considered
 intermittent flow
 """
+import numpy as np
 
-import equations
+from evaluation import EvaluationContext
 
 
-def slug_free_of_bubbles(u_gs, u_ls, liquid, gas, pipe):
+def slug_free_of_bubbles(u_gs, u_ls, liquid, gas, pipe, context=None):
     """condition for if liquid slug is free of entrained bubbles"""
+    if context is None:
+        context = EvaluationContext(u_gs, u_ls, liquid, gas, pipe)
 
     # calculate the holdup of gas inside of the liquid slug
-    gas_holdup_in_slug = equations.intermittent.liquid_slug_gas_holdup(
-        u_gs, u_ls, liquid, gas, pipe
+    gas_holdup_in_slug = context.slug_gas_holdup
+    liquid_holdup = np.subtract(
+        1, gas_holdup_in_slug, out=context.empty(gas_holdup_in_slug)
     )
-    liquid_holdup = 1 - gas_holdup_in_slug
 
     # the condition
-    return liquid_holdup >= 1
+    condition = liquid_holdup >= 1
+    context.discard(liquid_holdup)
+    return condition
 
 
-def slug_full_of_bubbles(u_gs, u_ls, liquid, gas, pipe):
+def slug_full_of_bubbles(u_gs, u_ls, liquid, gas, pipe, context=None):
     """condition for if liquid slug is at the maximum packing of
     of entrained bubbles where the slug collapses
     """
+    if context is None:
+        context = EvaluationContext(u_gs, u_ls, liquid, gas, pipe)
+
     # calculate the holdup of gas inside of the liquid slug
-    gas_holdup_in_slug = equations.intermittent.liquid_slug_gas_holdup(
-        u_gs, u_ls, liquid, gas, pipe
+    gas_holdup_in_slug = context.slug_gas_holdup
+    liquid_holdup = np.subtract(
+        1, gas_holdup_in_slug, out=context.empty(gas_holdup_in_slug)
     )
-    liquid_holdup = 1 - gas_holdup_in_slug
 
     # the condition
-    return liquid_holdup <= 0.48
+    condition = liquid_holdup <= 0.48
+    context.discard(liquid_holdup)
+    return condition
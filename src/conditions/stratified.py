@@ -3,17 +3,22 @@ the functions that define the conditions for flow to be considered
 stratified flow
 """
 import numpy as np
-from scipy.optimize import newton
-from general.general import Geometry
-from general import friction_factor, non_dimensional
-import equations
+import general
+from general import friction_factor
+from evaluation import EvaluationContext
 
 
-def equilibrium_equation(u_gs, u_ls, liquid, gas, pipe):
+def equilibrium_equation(u_gs, u_ls, liquid, gas, pipe, separable=True, context=None):
     """find if it is stratified or not at the critical height
         based on the the equilibrium level of liquid at every
     single u_gs, u_ls pair
+
+    If separable, the quantities that only depend on u_gs (critical height,
+    geometry and the gas side of the balance) are evaluated once per distinct
+    u_gs value and broadcast across u_ls
     """
+    if context is None:
+        context = EvaluationContext(u_gs, u_ls, liquid, gas, pipe, separable)
 
     # local variables for readability and correspondence to the equation
     rho_l = liquid.density
@@ -22,42 +27,51 @@ def equilibrium_equation(u_gs, u_ls, liquid, gas, pipe):
     mu_g = gas.dynamic_viscosity
     roughness = pipe.roughness
 
-    # Set inital guess that solves from the top
-    # the solution space is difficult
-    # TODO find how to set a good initial guess
-    height_initial = np.ones_like(u_gs) * 0.95
+    # the u_gs values the u_gs only quantities are evaluated at
+    u_gs_axis, inverse = context.u_gs_separable
+    expand = lambda values: general.from_separable_axis(values, inverse)
 
-    # the critical heights at which waves would start to grow
-    height_tilde = newton(
-        equations.stratified.wave_growth, height_initial, args=(u_gs, liquid, gas, pipe)
-    )
-
-    # non dimensional
-    tilde = Geometry(height_tilde, non_dimensional=True)
-    # dimensional
-    geom = Geometry(
-        height_tilde, non_dimensional=False, pipe=pipe, u_gs=u_gs, u_ls=u_ls
-    )
+    # non dimensional geometry at the critical heights at which
+    # waves would start to grow
+    tilde = context.critical_geometry
 
     # get the non dimensional numbers
-    x_sqrd = non_dimensional.lockhart_martinelli(u_gs, u_ls, liquid, gas, pipe) ** 2
-    y_grav = non_dimensional.y_gravity(u_gs, u_ls, liquid, gas, pipe)
+    x_sqrd = context.x_sqrd
+    y_grav = context.y_grav
 
     # get the single fluid reynolds numbers from the non dimensional values
-    reynolds_ls = rho_l * u_ls * pipe.diameter / mu_l
-    reynolds_gs = rho_g * u_gs * pipe.diameter / mu_g
+    # reynolds_ls = rho_l * u_ls * pipe.diameter / mu_l
+    reynolds_ls = np.multiply(
+        rho_l, u_ls, out=context.empty(rho_l, u_ls, pipe.diameter, mu_l)
+    )
+    np.multiply(reynolds_ls, pipe.diameter, out=reynolds_ls)
+    np.divide(reynolds_ls, mu_l, out=reynolds_ls)
+    reynolds_gs = rho_g * u_gs_axis * pipe.diameter / mu_g
 
     # get the actual fluid average reynolds
-    reynolds_l_actual = rho_l * geom.vel_l * geom.hydr_diam_l / mu_l
-    reynolds_g_actual = rho_l * geom.vel_g * geom.hydr_diam_g / mu_l
+    # reynolds_l_actual = rho_l * (vel_l * u_ls) * (hydr_diam_l * diameter) / mu_l
+    hydr_diam_l = expand(tilde.hydr_diam_l) * pipe.diameter
+    reynolds_l_actual = np.multiply(
+        expand(tilde.vel_l),
+        u_ls,
+        out=context.empty(expand(tilde.vel_l), u_ls, rho_l, hydr_diam_l, mu_l),
+    )
+    np.multiply(rho_l, reynolds_l_actual, out=reynolds_l_actual)
+    np.multiply(reynolds_l_actual, hydr_diam_l, out=reynolds_l_actual)
+    np.divide(reynolds_l_actual, mu_l, out=reynolds_l_actual)
+    reynolds_g_actual = (
+        rho_l * (tilde.vel_g * u_gs_axis) * (tilde.hydr_diam_g * pipe.diameter) / mu_l
+    )
 
     # get the friction factors for all the fluids
     # actual
-    friction_g = friction_factor.niazkar_and_churchill(reynolds_g_actual, roughness)
-    friction_l = friction_factor.niazkar_and_churchill(reynolds_l_actual, roughness)
+    friction_g = friction_factor.darcy(reynolds_g_actual, roughness)
+    friction_l = friction_factor.darcy(reynolds_l_actual, roughness)
     # single fluid
-    friction_gs = friction_factor.niazkar_and_churchill(reynolds_gs, roughness)
-    friction_ls = friction_factor.niazkar_and_churchill(reynolds_ls, roughness)
+    friction_gs = friction_factor.darcy(reynolds_gs, roughness)
+    context.discard(reynolds_l_actual)
+    friction_ls = friction_factor.darcy(reynolds_ls, roughness)
+    context.discard(reynolds_ls)
 
     # balance equation adapted from dimensional version of Taitel 1976
     gas_term = (
@@ -69,54 +83,81 @@ def equilibrium_equation(u_gs, u_ls, liquid, gas, pipe):
             + (tilde.perim_interf / tilde.area_g)
         )
     )
-    liq_term = (
-        x_sqrd
-        * (friction_l / friction_ls)
-        * (tilde.vel_l ** 2)
-        * (tilde.perim_l / tilde.area_l)
+    liq_geometry = expand((tilde.vel_l ** 2) * (tilde.perim_l / tilde.area_l))
+    # the balance is evaluated in one buffer of the context
+    # x_sqrd * (friction_l / friction_ls) * liq_geometry
+    balance = context.empty(
+        expand(gas_term), x_sqrd, friction_l, friction_ls, liq_geometry, y_grav
     )
-    grav_term = 4 * y_grav
+    liq_term = np.divide(friction_l, friction_ls, out=balance)
+    del friction_l, friction_ls
+    np.multiply(x_sqrd, liq_term, out=liq_term)
+    np.multiply(liq_term, liq_geometry, out=liq_term)
+    grav_term = np.multiply(4, y_grav, out=context.empty(y_grav))
 
     # this indicates the area where waves start to grow and the
     # equilibrium equation is not met
-    return gas_term - liq_term - grav_term > 0
+    np.subtract(expand(gas_term), liq_term, out=balance)
+    np.subtract(balance, grav_term, out=balance)
+    not_in_equilibrium = balance > 0
+    context.discard(balance, grav_term)
+    return not_in_equilibrium
 
 
-def too_steep_for_stratified(u_gs, u_ls, liquid, gas, pipe):
+def too_steep_for_stratified(
+    u_gs, u_ls, liquid, gas, pipe, separable=True, context=None
+):
     """
     check if the liquid velocity is so high that in steep inclination it
     ends up tearing droplets apart from the wavy turbulent interface resulting
     in annular flow
     Barnea 1987 eq 13-14
     """
+    if context is None:
+        context = EvaluationContext(u_gs, u_ls, liquid, gas, pipe, separable)
+
     rho_l = liquid.density
     mu_l = liquid.dynamic_viscosity
     roughness = pipe.roughness
     grav = pipe.gravity
     beta = pipe.inclination
 
-    # Set inital guess that solves from the top
-    # the solution space is difficult
-    # TODO find how to set a good initial guess
-    height_initial = np.ones_like(u_gs) * 0.95
+    # the indices that broadcast the u_gs only quantities
+    _, inverse = context.u_gs_separable
+    expand = lambda values: general.from_separable_axis(values, inverse)
+
     # the critical heights at which waves would start to grow
-    height_tilde = newton(
-        equations.stratified.wave_growth, height_initial, args=(u_gs, liquid, gas, pipe)
-    )
-    # dimensional
-    geom = Geometry(
-        height_tilde, non_dimensional=False, pipe=pipe, u_gs=u_gs, u_ls=u_ls
+    height_tilde = context.critical_height
+    # non dimensional
+    tilde = context.critical_geometry
+
+    # the dimensional liquid velocity and hydraulic diameter
+    vel_l = np.multiply(
+        expand(tilde.vel_l), u_ls, out=context.empty(expand(tilde.vel_l), u_ls)
     )
+    hydr_diam_l = expand(tilde.hydr_diam_l) * pipe.diameter
 
     # right hand side
     # get the actual fluid average reynolds and related frtiction factor
-    reynolds_l_actual = rho_l * geom.vel_l * geom.hydr_diam_l / mu_l
-    friction_l = friction_factor.niazkar_and_churchill(reynolds_l_actual, roughness)
-
-    rhs = grav * pipe.diameter * (1 - height_tilde) * np.cos(beta) / friction_l
+    # reynolds_l_actual = rho_l * vel_l * hydr_diam_l / mu_l
+    reynolds_l_actual = np.multiply(
+        rho_l, vel_l, out=context.empty(rho_l, vel_l, hydr_diam_l, mu_l)
+    )
+    np.multiply(reynolds_l_actual, hydr_diam_l, out=reynolds_l_actual)
+    np.divide(reynolds_l_actual, mu_l, out=reynolds_l_actual)
+    friction_l = friction_factor.darcy(reynolds_l_actual, roughness)
+    context.discard(reynolds_l_actual)
+
+    rhs_numerator = grav * pipe.diameter * (1 - expand(height_tilde)) * np.cos(beta)
+    rhs = np.divide(
+        rhs_numerator, friction_l, out=context.empty(rhs_numerator, friction_l)
+    )
+    del friction_l
 
     # left hand side with actual fluid velocity
-    lhs = geom.vel_l ** 2
+    lhs = np.square(vel_l, out=vel_l)
 
     # the condition
-    return lhs > rhs
+    too_steep = lhs > rhs
+    context.discard(lhs, rhs)
+    return too_steep
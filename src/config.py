@@ -2,7 +2,40 @@
 Configuration file. Contains the class that is
 used for configuration and the configuration variables
 """
-from matplotlib import cm
+import os
+
+
+class LazyColormap:
+    """
+    class attribute with the colormap of the categories. matplotlib is only
+    imported the first time the colormap is used, so the calculations don't
+    depend on it
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __set_name__(self, owner, attribute):
+        self.attribute = attribute
+
+    def __get__(self, instance, owner):
+        colormap = category_colormap(self.name, len(owner.CATEGORIES))
+        # replace the descriptor with the colormap, to create it only once
+        setattr(owner, self.attribute, colormap)
+        return colormap
+
+
+def category_colormap(name, categories):
+    """get the matplotlib colormap with one color per category"""
+    import matplotlib
+
+    try:
+        return matplotlib.colormaps[name].resampled(categories)
+    except AttributeError:
+        # matplotlib before 3.6
+        from matplotlib import cm
+
+        return cm.get_cmap(name, lut=categories)
 
 
 class Config:
@@ -16,6 +49,20 @@ class Config:
     MIN_UGS = 1e-2
     MAX_UGS = 1e2
 
+    # how the friction factors are evaluated,
+    # one of ["explicit", "colebrook", "table"]
+    FRICTION_BACKEND = "explicit"
+
+    # the memory of the reusable arrays kept between map computations
+    WORKSPACE_MAX_BYTES = 2 ** 28
+
+    # the cache of category maps, kept in memory and on disk
+    CACHE_MEMORY_ITEMS = 32
+    CACHE_DIRECTORY = os.path.join(
+        os.path.expanduser("~"), ".cache", "two_phase_flow_map"
+    )
+    CACHE_DISK_BYTES = 2 ** 30
+
     CATEGORIES = {
         "dispersed bubble": 0,
         "stratified": 1,
@@ -25,4 +72,7 @@ class Config:
         "slug": 5,
         "churn": 6,
     }
-    CMAP = cm.get_cmap("Dark2", lut=len(CATEGORIES))
+    # the value of the points of uint8 category maps without a category
+    NO_CATEGORY = 255
+    # created with matplotlib on first use
+    CMAP = LazyColormap("Dark2")
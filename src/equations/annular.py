@@ -2,6 +2,45 @@
 the functions that to calculate the conditions for flow to be considered
 annular flow
 """
+import numpy as np
+from general import root_finding
+
+# the open interval of valid holdups
+HOLDUP_MIN = 1e-9
+HOLDUP_MAX = 1 - 1e-9
+
+
+def liquid_holdup(
+    u_gs, u_ls, y_grav, x_sqrd, workspace=None, initial=None, full_output=False
+):
+    """iterate to find the annular liquid holdup at every u_gs, u_ls
+    location, starting from the no slip holdup. The buffers of the
+    iterations are taken from the workspace if it is supplied.
+    initial are guesses at every location, e.g. the holdups of a similar
+    scenario, with the no slip holdup where they are nan and as the
+    fallback where they fail. Returns the root_finding.RootResults of the
+    holdups instead if full_output
+    """
+    initial_alpha_l = 1 - u_gs / (u_ls + u_gs)
+    # one guess for every point the holdup is solved at
+    initial_alpha_l = np.broadcast_to(
+        initial_alpha_l, np.broadcast(initial_alpha_l, y_grav, x_sqrd).shape
+    )
+    alpha_l = root_finding.newton(
+        liquid_instability,
+        initial_alpha_l
+        if initial is None
+        else np.where(np.isnan(initial), initial_alpha_l, initial),
+        args=(
+            y_grav,
+            x_sqrd,
+        ),
+        bracket=(HOLDUP_MIN, HOLDUP_MAX),
+        workspace=workspace,
+        full_output=full_output,
+        fallback=None if initial is None else initial_alpha_l,
+    )
+    return alpha_l
 
 
 def liquid_instability(alpha_l, y_grav, x_sqrd):
@@ -12,24 +51,42 @@ def liquid_instability(alpha_l, y_grav, x_sqrd):
     # equation 15
     rhs = equation15_barnea1987(alpha_l, x_sqrd)
 
-    return y_grav - rhs
+    return np.subtract(y_grav, rhs, out=rhs)
 
 
 def equation15_barnea1987(alpha_l, x_sqrd):
     """
-    equation 15 in barnea 1987
+    equation 15 in barnea 1987. Evaluated in place on two arrays, since it
+    is evaluated on the whole map at every iteration of the holdup
     """
-    term_1 = (1 + 75 * alpha_l) / (alpha_l * ((1 - alpha_l) ** (5 / 2)))
-    term_2 = (1 / (alpha_l ** 3)) * x_sqrd
-    y_grav = term_1 - term_2
+    # term_1 = (1 + 75 * alpha_l) / (alpha_l * ((1 - alpha_l) ** (5 / 2)))
+    term_1 = np.multiply(75, alpha_l)
+    np.add(1, term_1, out=term_1)
+    denominator = np.subtract(1, alpha_l)
+    np.power(denominator, 5 / 2, out=denominator)
+    np.multiply(alpha_l, denominator, out=denominator)
+    np.divide(term_1, denominator, out=term_1)
+
+    # term_2 = (1 / (alpha_l ** 3)) * x_sqrd
+    term_2 = np.power(alpha_l, 3, out=denominator)
+    np.divide(1, term_2, out=term_2)
+    np.multiply(term_2, x_sqrd, out=term_2)
+
+    y_grav = np.subtract(term_1, term_2, out=term_1)
     return y_grav
 
 
 def equation16_barnea1987(alpha_l, x_sqrd):
     """
-    equation 16 in barnea 1987
+    equation 16 in barnea 1987, evaluated in place like equation 15
     """
-    numerator = 2 - (3 / 2) * alpha_l
-    denominator = (alpha_l ** 3) * (1 - (3 / 2) * alpha_l)
-    y_grav = (numerator / denominator) * x_sqrd
-    return y_grav
+    # numerator = 2 - (3 / 2) * alpha_l
+    numerator = np.multiply(3 / 2, alpha_l)
+    denominator = np.subtract(1, numerator)
+    np.subtract(2, numerator, out=numerator)
+
+    # denominator = (alpha_l ** 3) * (1 - (3 / 2) * alpha_l)
+    np.multiply(alpha_l ** 3, denominator, out=denominator)
+
+    y_grav = np.divide(numerator, denominator, out=numerator)
+    return np.multiply(y_grav, x_sqrd, out=y_grav)
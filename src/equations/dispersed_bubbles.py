@@ -24,13 +24,17 @@ def deformed_bubble_critical_size(liquid, gas, pipe):
     return diam_crit_deformed
 
 
-def migration_to_top_critical_size(u_gs, u_ls, liquid, gas, pipe):
+def migration_to_top_critical_size(
+    u_gs, u_ls, liquid, gas, pipe, mix=None, friction_mix=None, out=None
+):
     """calculate the critical size below which a bubble can't travel
-    to the upper part of pipe
+    to the upper part of pipe. The mixture and its friction factor
+    are calculated if not supplied. Written to out if it is supplied
     eq. 6 Barnea 1987
     """
     # get the mixture
-    mix = fluids.Mix(u_gs, u_ls, liquid, gas, pipe)
+    if mix is None:
+        mix = fluids.Mix(u_gs, u_ls, liquid, gas, pipe)
 
     # local variables for readability
     rho_l = liquid.density
@@ -42,15 +46,21 @@ def migration_to_top_critical_size(u_gs, u_ls, liquid, gas, pipe):
     # get the mixture velocity
     u_mix = mix.mixture_velocity(u_gs, u_ls)
 
-    # mixture reynolds number
-    reynolds_mix = general.reynolds(u_mix, mix, pipe)
-
     # mixture friction factor
-    friction_mix = friction_factor.fang(reynolds_mix, roughness)
+    if friction_mix is None:
+        # mixture reynolds number
+        reynolds_mix = general.reynolds(u_mix, mix, pipe)
+        friction_mix = friction_factor.fang(reynolds_mix, roughness)
 
     # critical bubble size
-    diam_crit_migration = (
-        (3 / 8) * (rho_l / (rho_l - rho_g)) * (friction_mix * (u_mix ** 2))
-    ) / (grav * np.cos(beta))
-
-    return diam_crit_migration
+    # (3 / 8) * (rho_l / (rho_l - rho_g)) * (friction_mix * (u_mix ** 2))
+    # / (grav * np.cos(beta))
+    out = general.output_array(out, u_mix, friction_mix, rho_l, rho_g, grav, beta)
+    diam_crit_migration = np.square(u_mix, out=out)
+    np.multiply(friction_mix, diam_crit_migration, out=diam_crit_migration)
+    np.multiply(
+        (3 / 8) * (rho_l / (rho_l - rho_g)),
+        diam_crit_migration,
+        out=diam_crit_migration,
+    )
+    return np.divide(diam_crit_migration, grav * np.cos(beta), out=diam_crit_migration)
@@ -10,9 +10,12 @@ import fluids
 from . import dispersed_bubbles
 
 
-def liquid_slug_gas_holdup(u_gs, u_ls, liquid, gas, pipe):
+def liquid_slug_gas_holdup(
+    u_gs, u_ls, liquid, gas, pipe, mix=None, u_mix=None, reynolds_mix=None
+):
     """
-    calculate the slug holdup based on mixed properties
+    calculate the slug holdup based on mixed properties. The mixture and its
+    velocity and reynolds number are calculated if not supplied
     Barnea 1987
     """
     # local variables for readability
@@ -21,28 +24,42 @@ def liquid_slug_gas_holdup(u_gs, u_ls, liquid, gas, pipe):
     diam = pipe.diameter
 
     # get the mixture values
-    mix = fluids.Mix(u_gs, u_ls, liquid, gas, pipe)
+    if mix is None:
+        mix = fluids.Mix(u_gs, u_ls, liquid, gas, pipe)
     # get the mixture velocity
-    u_mix = mix.mixture_velocity(u_gs, u_ls)
+    if u_mix is None:
+        u_mix = mix.mixture_velocity(u_gs, u_ls)
     # mixture reynolds number
-    reynolds_mix = general.reynolds(u_mix, mix, pipe)
+    if reynolds_mix is None:
+        reynolds_mix = general.reynolds(u_mix, mix, pipe)
     # mixture friction factor
-    fric_mix = friction_factor.niazkar_and_churchill(reynolds_mix, pipe.roughness)
+    fric_mix = friction_factor.darcy(reynolds_mix, pipe.roughness)
 
     # get the critical size
     critical_diam = dispersed_bubbles.deformed_bubble_critical_size(liquid, gas, pipe)
 
-    # the expression split in terms for readability
-    term_1 = critical_diam * (2 * fric_mix * (u_mix ** 3) / diam) ** (2 / 5)
+    # the expression split in terms for readability, evaluated in place
+    # term_1 = critical_diam * (2 * fric_mix * (u_mix ** 3) / diam) ** (2 / 5)
+    holdup = general.output_array(None, fric_mix, u_mix, diam, critical_diam)
+    scratch = np.empty_like(holdup)
+    term_1 = np.multiply(2, fric_mix, out=holdup)
+    np.multiply(term_1, np.power(u_mix, 3, out=scratch), out=term_1)
+    np.divide(term_1, diam, out=term_1)
+    np.power(term_1, 2 / 5, out=term_1)
+    np.multiply(critical_diam, term_1, out=term_1)
     term_2 = (rho_l / sigma) ** (3 / 5)
 
-    holdup = 0.058 * (term_1 * term_2 - 0.725) ** 2
+    # term_1 * term_2 - 0.725
+    difference = np.multiply(term_1, term_2, out=term_1)
+    np.subtract(difference, 0.725, out=difference)
 
     # recuperate the sign that was lost in the maths
-    sign = np.sign(term_1 * term_2 - 0.725)
+    sign = np.sign(difference, out=scratch)
+
+    # holdup = 0.058 * (term_1 * term_2 - 0.725) ** 2
+    holdup = np.square(difference, out=holdup)
+    np.multiply(0.058, holdup, out=holdup)
 
     # negative holdups do not make sense, but this equation is used in ways
     # that requires the positive and negative numbers to be available
-    holdup = sign * holdup
-
-    return holdup
+    return np.multiply(sign, holdup, out=holdup)
@@ -3,8 +3,14 @@ the functions that are used to calculate the conditions for flow to be considere
 stratified flow
 """
 import numpy as np
+import general
+from general import root_finding
 from general.general import Geometry
 
+# the open interval of valid non dimensional heights
+HEIGHT_MIN = 1e-9
+HEIGHT_MAX = 1 - 1e-9
+
 
 def wave_growth(crit_height, u_gs, liquid, gas, pipe):
     """f(x) = 0 formulation to find the critical fluid height
@@ -15,6 +21,13 @@ def wave_growth(crit_height, u_gs, liquid, gas, pipe):
     # get the modified froude number
     froude = modified_froude(u_gs, liquid, gas, pipe)
 
+    return froude_wave_growth(crit_height, froude)
+
+
+def froude_wave_growth(crit_height, froude):
+    """wave growth equation as a function of the modified froude number,
+    which is the only value it depends on besides the height
+    """
     # fix broken values
     crit_height[crit_height > 1] = 1
     crit_height[crit_height < 0] = 0
@@ -35,6 +48,50 @@ def wave_growth(crit_height, u_gs, liquid, gas, pipe):
     return lhs - 1
 
 
+def critical_height(
+    u_gs, liquid, gas, pipe, separable=True, initial=None, full_output=False
+):
+    """solve the wave growth equation for the non dimensional critical
+    height at every u_gs location.
+
+    The equation only depends on u_gs, so if separable it is solved once
+    per distinct u_gs value and broadcast back to the shape of u_gs.
+    initial are guesses on those values, e.g. the heights of a similar
+    scenario, with the default guess where they are nan and as the
+    fallback where they fail. Returns the root_finding.RootResults of the
+    heights instead if full_output
+    """
+    u_gs_axis, inverse = general.separable_axis(u_gs, separable)
+
+    # get the modified froude number
+    froude = modified_froude(u_gs_axis, liquid, gas, pipe)
+
+    # Set inital guess that solves from the top, the bracket keeps
+    # the iterations inside of the valid heights
+    height_initial = np.ones_like(froude) * 0.95
+
+    # the critical heights at which waves would start to grow
+    solution = root_finding.newton(
+        froude_wave_growth,
+        height_initial
+        if initial is None
+        else np.where(np.isnan(initial), height_initial, initial),
+        args=(froude,),
+        bracket=(HEIGHT_MIN, HEIGHT_MAX),
+        full_output=True,
+        fallback=None if initial is None else height_initial,
+    )
+
+    if full_output:
+        return solution._replace(
+            root=general.from_separable_axis(solution.root, inverse),
+            converged=general.from_separable_axis(solution.converged, inverse),
+            iterations=general.from_separable_axis(solution.iterations, inverse),
+            residual=general.from_separable_axis(solution.residual, inverse),
+        )
+    return general.from_separable_axis(solution.root, inverse)
+
+
 def modified_froude(u_gs, liquid, gas, pipe):
     """calculate the modified froude modified by density ratio"""
 
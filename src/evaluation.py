@@ -0,0 +1,309 @@
+"""
+the evaluation context of a single map computation. It stores the
+intermediate values that more than one condition needs so that each of
+them is only calculated once
+"""
+from functools import cached_property
+
+import numpy as np
+
+import general
+from general import friction_factor
+from general.general import Geometry
+import equations
+import fluids
+
+
+class EvaluationContext:
+    """
+    lazily calculates and memoizes the intermediate values of one map
+    computation. Every value is calculated the first time it is requested
+
+    maximum_u_gs and bubbly_present are the values that depend on the whole
+    batch of points instead of on each point. They are found from the batch
+    when the map is computed if they are not supplied, separately for each map
+    along map_axes. By default the whole batch is one map
+
+    If a workspace is supplied, the values are written to its buffers, which
+    are given back to it by release once the map is computed
+
+    If a WarmStart is supplied, the solves start from the roots it kept of
+    the previous map and keep their roots for the next one
+    """
+
+    def __init__(
+        self,
+        u_gs,
+        u_ls,
+        liquid,
+        gas,
+        pipe,
+        separable=True,
+        maximum_u_gs=None,
+        bubbly_present=None,
+        map_axes=None,
+        workspace=None,
+        warm_start=None,
+    ):
+        self.u_gs = u_gs
+        self.u_ls = u_ls
+        self.liquid = liquid
+        self.gas = gas
+        self.pipe = pipe
+        self.separable = separable
+
+        # the batch dependent values
+        self.maximum_u_gs = maximum_u_gs
+        self.bubbly_present = bubbly_present
+        self.map_axes = map_axes
+
+        # the buffers taken from the workspace
+        self.workspace = workspace
+        self._buffers = []
+
+        self.warm_start = warm_start
+
+    def empty(self, *inputs):
+        """get an uninitialized array of the broadcast shape of the inputs,
+        from the workspace if there is one
+        """
+        shape = np.broadcast_shapes(*(np.shape(value) for value in inputs))
+        if self.workspace is None:
+            return np.empty(shape)
+        buffer = self.workspace.empty(shape)
+        self._buffers.append(buffer)
+        return buffer
+
+    def discard(self, *arrays):
+        """give the buffers of arrays that are not needed anymore back to
+        the workspace, so the next values can reuse them
+        """
+        if self.workspace is None:
+            return
+        for array in arrays:
+            self._buffers = [buffer for buffer in self._buffers if buffer is not array]
+        self.workspace.release(*arrays)
+
+    def release(self):
+        """give every buffer back to the workspace and forget the values
+        that were written to them
+        """
+        if self.workspace is None:
+            return
+        self.workspace.release(*self._buffers)
+        self._buffers = []
+        for name in list(vars(self)):
+            if isinstance(getattr(type(self), name, None), cached_property):
+                del self.__dict__[name]
+
+    def _guess(self, name, shape):
+        """the guesses of the warm start for a value of a shape, if any"""
+        if self.warm_start is None:
+            return None
+        return self.warm_start.guess(name, shape)
+
+    def _keep(self, name, solution):
+        """keep the roots of a solve of a value for the next warm started
+        map
+        """
+        if self.warm_start is not None:
+            self.warm_start.keep(name, solution)
+
+    # single phase values
+    @cached_property
+    def dpdx_gs(self):
+        """the dpdx of the gas flowing alone in the pipe"""
+        return general.single_phase_dpdx(
+            self.u_gs, self.gas, self.pipe, out=self._empty_dpdx(self.u_gs, self.gas)
+        )
+
+    @cached_property
+    def dpdx_ls(self):
+        """the dpdx of the liquid flowing alone in the pipe"""
+        return general.single_phase_dpdx(
+            self.u_ls,
+            self.liquid,
+            self.pipe,
+            out=self._empty_dpdx(self.u_ls, self.liquid),
+        )
+
+    def _empty_dpdx(self, velocity, fluid):
+        """the buffer of the single phase dpdx of a fluid"""
+        return self.empty(
+            velocity,
+            fluid.density,
+            fluid.dynamic_viscosity,
+            self.pipe.diameter,
+            self.pipe.roughness,
+        )
+
+    # non dimensional numbers
+    @cached_property
+    def x_sqrd(self):
+        """the squared lockhart martinelli number"""
+        lock_mart_number = general.lockhart_martinelli(
+            self.u_gs,
+            self.u_ls,
+            self.liquid,
+            self.gas,
+            self.pipe,
+            dpdx_gs=self.dpdx_gs,
+            dpdx_ls=self.dpdx_ls,
+            out=self.empty(self.dpdx_gs, self.dpdx_ls),
+        )
+        return np.square(lock_mart_number, out=lock_mart_number)
+
+    @cached_property
+    def y_grav(self):
+        """the y value of the relative gravity and pressure drop forces"""
+        return general.y_gravity(
+            self.u_gs,
+            self.u_ls,
+            self.liquid,
+            self.gas,
+            self.pipe,
+            dpdx_gs=self.dpdx_gs,
+            out=self.empty(
+                self.dpdx_gs,
+                self.liquid.density,
+                self.gas.density,
+                self.pipe.inclination,
+            ),
+        )
+
+    # mixture values
+    @cached_property
+    def mix(self):
+        """the 2-phase mixture with no slip holdup"""
+        return fluids.Mix(self.u_gs, self.u_ls, self.liquid, self.gas, self.pipe)
+
+    @cached_property
+    def u_mix(self):
+        """the mixture velocity"""
+        return np.add(self.u_gs, self.u_ls, out=self.empty(self.u_gs, self.u_ls))
+
+    @cached_property
+    def reynolds_mix(self):
+        """the mixture reynolds number"""
+        return general.reynolds(
+            self.u_mix,
+            self.mix,
+            self.pipe,
+            out=self.empty(
+                self.u_mix,
+                self.mix.density,
+                self.mix.dynamic_viscosity,
+                self.pipe.diameter,
+            ),
+        )
+
+    @cached_property
+    def friction_mix(self):
+        """the mixture friction factor used in the bubble size equations"""
+        return friction_factor.fang(self.reynolds_mix, self.pipe.roughness)
+
+    # stratified values
+    @cached_property
+    def u_gs_separable(self):
+        """the u_gs values that the u_gs only quantities are evaluated at
+        and the indices that broadcast them back to the map
+        """
+        return general.separable_axis(self.u_gs, self.separable)
+
+    @cached_property
+    def critical_height(self):
+        """the non dimensional critical heights on the u_gs axis"""
+        u_gs_axis, _ = self.u_gs_separable
+        solution = equations.stratified.critical_height(
+            u_gs_axis,
+            self.liquid,
+            self.gas,
+            self.pipe,
+            separable=False,
+            initial=self._guess("critical_height", np.shape(u_gs_axis)),
+            full_output=True,
+        )
+        self._keep("critical_height", solution)
+        # the same clipping the geometry applies
+        return np.clip(solution.root, 0, 1)
+
+    @cached_property
+    def critical_geometry(self):
+        """the non dimensional geometry at the critical heights"""
+        return Geometry(self.critical_height.copy(), non_dimensional=True)
+
+    # annular values
+    @cached_property
+    def annular_holdup(self):
+        """the annular liquid holdup, not yet cleaned of nonsensical values"""
+        solution = equations.annular.liquid_holdup(
+            self.u_gs,
+            self.u_ls,
+            self.y_grav,
+            self.x_sqrd,
+            workspace=self.workspace,
+            initial=self._guess(
+                "annular_holdup",
+                np.broadcast_shapes(
+                    np.shape(self.u_gs),
+                    np.shape(self.u_ls),
+                    np.shape(self.y_grav),
+                    np.shape(self.x_sqrd),
+                ),
+            ),
+            full_output=True,
+        )
+        self._keep("annular_holdup", solution)
+        return solution.root
+
+    # intermittent values
+    @cached_property
+    def slug_gas_holdup(self):
+        """the holdup of gas inside of the liquid slug"""
+        return equations.intermittent.liquid_slug_gas_holdup(
+            self.u_gs,
+            self.u_ls,
+            self.liquid,
+            self.gas,
+            self.pipe,
+            mix=self.mix,
+            u_mix=self.u_mix,
+            reynolds_mix=self.reynolds_mix,
+        )
+
+
+class WarmStart:
+    """
+    the roots of the solves of a map computation, kept as the initial
+    guesses of the next one. For sweeps of scenarios that change in small
+    steps, where the roots of neighbouring scenarios are close. Only the
+    roots that converged with an |f| of at most ftol are kept, the other
+    points start from the default guesses. The guesses of a value are only
+    used if they have its shape, and the points that don't converge from
+    them are solved again from the default guesses
+    """
+
+    def __init__(self, ftol=1e-3):
+        self.ftol = ftol
+        self.roots = {}
+
+    def guess(self, name, shape):
+        """the kept roots of a value, or None if there are none of the shape"""
+        roots = self.roots.get(name)
+        if roots is None or roots.shape != tuple(shape):
+            return None
+        return roots
+
+    def keep(self, name, solution):
+        """keep the roots of the root_finding.RootResults of a value for
+        the next map, with nan on the points that have no root to keep
+        """
+        self.roots[name] = np.where(
+            solution.converged & (solution.residual <= self.ftol),
+            solution.root,
+            np.nan,
+        )
+
+    def clear(self):
+        """forget every kept root"""
+        self.roots.clear()
@@ -1,21 +1,45 @@
 """
 define the constants of the two phases. Soft dependency on coolprop for some functionality
+
+The parameters of Gas, Liquid and Pipe can be 1D arrays, one value per
+scenario, to calculate the maps of many scenarios at once
 """
+import copy
+import hashlib
+
 import numpy as np
 
 
-class Gas:
+class _Parameters:
+    """
+    base class of the objects defined by their parameters
+    """
+
+    def fingerprint(self):
+        """get a hash of the class and the current parameter values, which
+        is the same for equal parameters in any process
+        """
+        digest = hashlib.sha256(type(self).__name__.encode())
+        for name, value in sorted(vars(self).items()):
+            value = np.asarray(value, dtype=float)
+            digest.update(name.encode())
+            digest.update(str(value.shape).encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+        return digest.hexdigest()
+
+
+class Gas(_Parameters):
     """
     define a class with gas properties
     """
 
     def __init__(self, mass_flowrate, density, dynamic_viscosity):
-        self.mass_flowrate = mass_flowrate
-        self.density = density
-        self.dynamic_viscosity = dynamic_viscosity
+        self.mass_flowrate = _parameter(mass_flowrate)
+        self.density = _parameter(density)
+        self.dynamic_viscosity = _parameter(dynamic_viscosity)
 
 
-class Liquid:
+class Liquid(_Parameters):
     """
     define a class with liquid properties
     """
@@ -23,23 +47,23 @@ class Liquid:
     def __init__(
         self, mass_flowrate, density, dynamic_viscosity, bubble_surface_tension
     ):
-        self.mass_flowrate = mass_flowrate
-        self.density = density
-        self.bubble_surface_tension = bubble_surface_tension
-        self.dynamic_viscosity = dynamic_viscosity
+        self.mass_flowrate = _parameter(mass_flowrate)
+        self.density = _parameter(density)
+        self.bubble_surface_tension = _parameter(bubble_surface_tension)
+        self.dynamic_viscosity = _parameter(dynamic_viscosity)
 
 
-class Pipe:
+class Pipe(_Parameters):
     """
     define a class with pipe constants
     """
 
     def __init__(self, diameter, inclination, roughness, gravity=9.81):
-        self.diameter = diameter
-        self.gravity = gravity
-        self.roughness = roughness
-        self.inclination = inclination * np.pi / 180
-        self.area = (diameter ** 2) * np.pi / 4
+        self.diameter = _parameter(diameter)
+        self.gravity = _parameter(gravity)
+        self.roughness = _parameter(roughness)
+        self.inclination = _parameter(inclination) * np.pi / 180
+        self.area = (self.diameter ** 2) * np.pi / 4
 
 
 class Mix:
@@ -102,3 +126,51 @@ class Mix:
             viscosity = self.liquid.dynamic_viscosity
 
         return viscosity
+
+
+def _parameter(value):
+    """keep scalar parameters as they are and turn sequences of
+    scenario values into arrays
+    """
+    if np.ndim(value) == 0:
+        return value
+    return np.asarray(value, dtype=float)
+
+
+def scenario_count(*objects):
+    """get the number of scenarios of the fluids and pipe objects, or None
+    if all of their parameters are scalars
+    """
+    lengths = [
+        np.size(value)
+        for obj in objects
+        for value in vars(obj).values()
+        if isinstance(value, np.ndarray)
+    ]
+    if not lengths:
+        return None
+    return np.broadcast_shapes(*((length,) for length in lengths))[0]
+
+
+def expand_scenarios(obj, ndim):
+    """get a copy of a fluid or pipe object with the scenario parameters
+    along a leading axis, followed by ndim axes of length 1 which broadcast
+    against the maps
+    """
+    expanded = copy.copy(obj)
+    for name, value in vars(obj).items():
+        if isinstance(value, np.ndarray):
+            setattr(expanded, name, value.reshape((-1,) + (1,) * ndim))
+    return expanded
+
+
+def select_scenario(obj, index):
+    """get a copy of a fluid or pipe object with the scalar parameters
+    of one scenario
+    """
+    selected = copy.copy(obj)
+    for name, value in vars(obj).items():
+        if isinstance(value, np.ndarray):
+            value = value.ravel()
+            setattr(selected, name, value[index if value.size > 1 else 0].item())
+    return selected
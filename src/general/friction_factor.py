@@ -7,8 +7,54 @@ https://github.com/IMEConsultants/colebrook/blob/master/colebrook/colebrook.py
 """
 
 
+from functools import lru_cache
+import time
+
 import numpy as np
 
+from config import Config
+import instrumentation
+from . import root_finding
+
+
+def darcy(reynolds, roughness, backend=None):
+    """calculate the friction factor with one of the backends
+    "explicit": niazkar_and_churchill correlations
+    "colebrook": colebrook-white solved exactly
+    "table": interpolated from a table of the explicit correlations
+    defaults to Config.FRICTION_BACKEND. The time is reported to the active
+    instrumentation, if there is one
+    """
+    if backend is None:
+        backend = Config.FRICTION_BACKEND
+
+    instrument = instrumentation.active()
+    if instrument is None:
+        return _darcy(reynolds, roughness, backend)
+
+    start = time.perf_counter()
+    friction = _darcy(reynolds, roughness, backend)
+    instrument.record(
+        "friction",
+        backend=backend,
+        points=int(np.size(friction)),
+        seconds=time.perf_counter() - start,
+    )
+    return friction
+
+
+def _darcy(reynolds, roughness, backend):
+    """calculate the friction factor with the backend"""
+    if backend == "explicit":
+        return niazkar_and_churchill(reynolds, roughness)
+    elif backend == "colebrook":
+        return colebrook(reynolds, roughness)
+    elif backend == "table":
+        return friction_table().lookup(reynolds, roughness)
+    raise ValueError(
+        "Friction backend needs to be one of ['explicit', 'colebrook', 'table']"
+    )
+
 
 def laminar(reynolds):
     """calculate laminar friction factor"""
@@ -20,17 +66,173 @@ def niazkar_and_churchill(reynolds, roughness):
     combines churchill's and niazkar model for locations where niazkar fails
     or where it is invalid
     """
-    reynolds = np.array(reynolds)
-    friction = np.full_like(reynolds, np.nan)
+    reynolds, roughness = np.broadcast_arrays(np.array(reynolds), roughness)
     friction = niazkar(reynolds, roughness)
     # where it hasn't solved, use churchill
-    friction[np.isnan(friction)] = churchill(reynolds[np.isnan(friction)], roughness)
+    unsolved = np.isnan(friction)
+    friction[unsolved] = churchill(reynolds[unsolved], roughness[unsolved])
     # in case it still has nans, apply laminar approximation
+    unsolved = np.isnan(friction)
+    friction[unsolved] = 64 / reynolds[unsolved]
+
+    # scalars for scalar inputs
+    return friction[()]
+
+
+def colebrook(reynolds, roughness, tol=1e-12, maxiter=50):
+    """
+    solve the implicit Colebrook-White equation
+        1/sqrt(f) = -2 log10(e/3.7D + 2.51/(Re sqrt(f)))
+    with newton steps on 1/sqrt(f) for every point. Reference for the
+    explicit correlations, with the same laminar fallback where it fails
+    """
+    reynolds, roughness = np.broadcast_arrays(
+        np.array(reynolds, dtype=float), roughness
+    )
+
+    def equation(inv_sqrt_f, reynolds, roughness):
+        return inv_sqrt_f + 2 * np.log10(roughness / 3.7 + 2.51 * inv_sqrt_f / reynolds)
+
+    def derivative(inv_sqrt_f, reynolds, roughness):
+        slope = 2.51 / reynolds
+        return 1 + 2 / np.log(10) * slope / (roughness / 3.7 + slope * inv_sqrt_f)
+
+    # the left hand side grows and the right hand side shrinks with
+    # 1/sqrt(f), so the single root is inside of any wide enough bracket
+    with np.errstate(divide="ignore", invalid="ignore"):
+        initial = -2 * np.log10(roughness / 3.7 + 5.74 / (reynolds ** 0.9))
+        initial = np.clip(np.nan_to_num(initial, nan=1), 1e-3, 1e3)
+        solution = root_finding.newton(
+            equation,
+            initial,
+            args=(reynolds, np.asarray(roughness, dtype=float)),
+            fprime=derivative,
+            tol=tol,
+            maxiter=maxiter,
+            bracket=(1e-6, 1e6),
+            full_output=True,
+        )
+        friction = np.where(solution.converged, 1 / (solution.root ** 2), np.nan)
+
+    # in case it has nans, apply laminar approximation
     friction[np.isnan(friction)] = 64 / reynolds[np.isnan(friction)]
 
     return friction
 
 
+class FrictionTable:
+    """table of the explicit friction factors over log10 of the reynolds
+    number and of the relative roughness, bilinearly interpolated.
+
+    A single roughness, as for every pipe, is interpolated once into a
+    column over the reynolds numbers. The points outside of the table,
+    which includes smooth pipes with a roughness of 0, are calculated
+    with the explicit correlations
+    """
+
+    def __init__(
+        self,
+        reynolds_range=(1e0, 1e10),
+        roughness_range=(1e-8, 1e-1),
+        reynolds_points=2049,
+        roughness_points=257,
+    ):
+        self.log_reynolds = np.linspace(*np.log10(reynolds_range), reynolds_points)
+        self.log_roughness = np.linspace(*np.log10(roughness_range), roughness_points)
+
+        log_reynolds, log_roughness = np.meshgrid(
+            self.log_reynolds, self.log_roughness, indexing="ij"
+        )
+        self.values = niazkar_and_churchill(10 ** log_reynolds, 10 ** log_roughness)
+
+    def lookup(self, reynolds, roughness):
+        """interpolate the friction factor of every reynolds, roughness pair"""
+        if np.ndim(roughness) == 0:
+            column = self.column(float(roughness))
+            if column is not None:
+                return self._interpolate_column(np.array(reynolds, dtype=float), column)
+
+        reynolds, roughness = np.broadcast_arrays(
+            np.array(reynolds, dtype=float), roughness
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_position = _position(np.log10(reynolds), self.log_reynolds)
+            y_position = _position(np.log10(roughness), self.log_roughness)
+        inside = np.isfinite(x_position) & np.isfinite(y_position)
+
+        # the cell of every point and the position inside of it
+        x_position = np.where(inside, x_position, 0)
+        y_position = np.where(inside, y_position, 0)
+        x_index = np.minimum(x_position.astype(np.intp), self.log_reynolds.size - 2)
+        y_index = np.minimum(y_position.astype(np.intp), self.log_roughness.size - 2)
+        x_weight = x_position - x_index
+        y_weight = y_position - y_index
+
+        # bilinear interpolation on the flattened table
+        columns = self.log_roughness.size
+        corner = x_index * columns + y_index
+        table = self.values.ravel()
+        lower = table[corner] + y_weight * (table[corner + 1] - table[corner])
+        upper = table[corner + columns] + y_weight * (
+            table[corner + columns + 1] - table[corner + columns]
+        )
+        friction = lower + x_weight * (upper - lower)
+
+        # calculate the points outside of the table
+        if not np.all(inside):
+            friction[~inside] = niazkar_and_churchill(
+                reynolds[~inside], roughness[~inside]
+            )
+
+        return friction
+
+    @lru_cache(maxsize=16)
+    def column(self, roughness):
+        """the table interpolated at a single roughness, None outside of it"""
+        with np.errstate(divide="ignore"):
+            y_position = _position(np.log10(roughness), self.log_roughness)
+        if np.isnan(y_position):
+            return None
+        y_index = min(int(y_position), self.log_roughness.size - 2)
+        y_weight = y_position - y_index
+        values = self.values[:, y_index] + y_weight * (
+            self.values[:, y_index + 1] - self.values[:, y_index]
+        )
+        return roughness, values, np.diff(values)
+
+    def _interpolate_column(self, reynolds, column):
+        """linearly interpolate a column of the table"""
+        roughness, values, slopes = column
+        with np.errstate(divide="ignore", invalid="ignore"):
+            position = _position(np.log10(reynolds), self.log_reynolds)
+        inside = np.isfinite(position)
+
+        index = np.minimum(
+            np.where(inside, position, 0).astype(np.intp), values.size - 2
+        )
+        friction = np.take(values, index) + (position - index) * np.take(slopes, index)
+
+        # calculate the points outside of the table
+        if not np.all(inside):
+            friction[~inside] = niazkar_and_churchill(reynolds[~inside], roughness)
+
+        return friction
+
+
+def _position(values, axis):
+    """the fractional index of the values on an equally spaced axis,
+    nan outside of it
+    """
+    position = (values - axis[0]) / (axis[1] - axis[0])
+    return np.where((position >= 0) & (position <= axis.size - 1), position, np.nan)
+
+
+@lru_cache(maxsize=None)
+def friction_table():
+    """the friction factor table, built the first time it is needed"""
+    return FrictionTable()
+
+
 def turb_swamee(reynolds, roughness):
     """
     Model: Swamee, Jain
@@ -72,12 +274,43 @@ def niazkar(reynolds, roughness):
     Suitable Range:
         turbulent
     """
-    a = -2 * np.log10(roughness / 3.7 + 4.5547 / (reynolds ** 0.08784))
-    b = -2 * np.log10(roughness / 3.7 + 2.51 * a / reynolds)
-    c = -2 * np.log10(roughness / 3.7 + 2.51 * b / reynolds)
-    inv_sqrt_f = a - ((b - a) ** 2) / (c - 2 * b + a)
+    # evaluated in place on four arrays, as it is evaluated on whole maps
+    relative = roughness / 3.7
+
+    # a = -2 * np.log10(roughness / 3.7 + 4.5547 / (reynolds ** 0.08784))
+    a = np.empty(np.broadcast(reynolds, relative).shape)
+    np.power(reynolds, 0.08784, out=a)
+    np.divide(4.5547, a, out=a)
+    np.add(relative, a, out=a)
+    np.log10(a, out=a)
+    np.multiply(-2, a, out=a)
+
+    # b = -2 * np.log10(roughness / 3.7 + 2.51 * a / reynolds)
+    b = np.multiply(2.51, a, out=np.empty_like(a))
+    np.divide(b, reynolds, out=b)
+    np.add(relative, b, out=b)
+    np.log10(b, out=b)
+    np.multiply(-2, b, out=b)
 
-    friction = 1 / (inv_sqrt_f ** 2)
+    # c = -2 * np.log10(roughness / 3.7 + 2.51 * b / reynolds)
+    c = np.multiply(2.51, b, out=np.empty_like(a))
+    np.divide(c, reynolds, out=c)
+    np.add(relative, c, out=c)
+    np.log10(c, out=c)
+    np.multiply(-2, c, out=c)
+
+    # inv_sqrt_f = a - ((b - a) ** 2) / (c - 2 * b + a)
+    numerator = np.subtract(b, a, out=np.empty_like(a))
+    np.square(numerator, out=numerator)
+    np.multiply(2, b, out=b)
+    np.subtract(c, b, out=c)
+    np.add(c, a, out=c)
+    np.divide(numerator, c, out=numerator)
+    inv_sqrt_f = np.subtract(a, numerator, out=a)
+
+    # friction = 1 / (inv_sqrt_f ** 2)
+    np.square(inv_sqrt_f, out=inv_sqrt_f)
+    friction = np.divide(1, inv_sqrt_f, out=inv_sqrt_f)
 
     return friction
 
@@ -106,18 +339,21 @@ def fang(reynolds, roughness):
         Reynolds > 2300 (I.E. Turbulent and Transition Range only)
     """
 
-    friction = (
-        1.613
-        * (
-            np.log(
-                0.234 * roughness ** 1.1007
-                - 60.525 / reynolds ** 1.1105
-                + 56.291 / reynolds ** 1.0712
-            )
-        )
-        ** -2
-    )
-    return friction
+    # friction = 1.613 * (np.log(0.234 * roughness ** 1.1007
+    # - 60.525 / reynolds ** 1.1105 + 56.291 / reynolds ** 1.0712)) ** -2
+    # in place on two arrays
+    shape = np.broadcast(reynolds, roughness).shape
+    friction = np.power(reynolds, 1.1105, out=np.empty(shape))
+    np.divide(60.525, friction, out=friction)
+    np.subtract(0.234 * roughness ** 1.1007, friction, out=friction)
+    term = np.power(reynolds, 1.0712, out=np.empty(shape))
+    np.divide(56.291, term, out=term)
+    np.add(friction, term, out=friction)
+    del term
+    np.log(friction, out=friction)
+    np.power(friction, -2, out=friction)
+    np.multiply(1.613, friction, out=friction)
+    return friction[()]
 
 
 def ept(reynolds, roughness):
@@ -183,6 +419,8 @@ if __name__ == "__main__":
     factors.append(["niazkar", niazkar(reynolds_num, rel_rough)])
     factors.append(["churchill", churchill(reynolds_num, rel_rough)])
     factors.append(["nzkrchr", niazkar_and_churchill(reynolds_num, rel_rough)])
+    factors.append(["colebrook", colebrook(reynolds_num, rel_rough)])
+    factors.append(["table", friction_table().lookup(reynolds_num, rel_rough)])
     factors.append(["ak", ak(reynolds_num, rel_rough)])
     factors.append(["bkc", bkc(reynolds_num, rel_rough)])
     factors.append(["ept", ept(reynolds_num, rel_rough)])
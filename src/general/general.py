@@ -2,9 +2,8 @@
 and are used by several different other modules
 """
 import numpy as np
-from scipy.optimize import newton
 
-from . import non_dimensional, friction_factor
+from . import non_dimensional, friction_factor, root_finding
 
 
 def fluid_area_ratio(velocity, fluid, pipe):
@@ -20,24 +19,76 @@ def fluid_area_ratio(velocity, fluid, pipe):
     return area_ratio
 
 
-def single_phase_dpdx(velocity, fluid, pipe):
-    """get the dpdx of one phase flowing alone in the pipe"""
+def output_array(out, *inputs):
+    """get the array that the result of an operation on the inputs is
+    written to, the supplied out or a new one
+    """
+    if out is None:
+        out = np.empty(np.broadcast(*inputs).shape)
+    return out
+
+
+def single_phase_dpdx(velocity, fluid, pipe, out=None):
+    """get the dpdx of one phase flowing alone in the pipe,
+    written to out if it is supplied
+    """
     # local variables
     rho = fluid.density
     roughness = pipe.roughness
     diam = pipe.diameter
 
+    out = output_array(out, velocity, rho, diam, fluid.dynamic_viscosity, roughness)
+
     # get reynolds
-    reynolds = non_dimensional.reynolds(velocity, fluid, pipe)
+    reynolds = non_dimensional.reynolds(velocity, fluid, pipe, out=out)
 
     # get friction factor
-    fric = friction_factor.niazkar_and_churchill(reynolds, roughness)
+    fric = np.asarray(friction_factor.darcy(reynolds, roughness))
 
-    dpdx_s = (4 / diam) * fric * rho * (velocity ** 2) / 2
+    # dpdx_s = (4 / diam) * fric * rho * (velocity ** 2) / 2
+    # in the buffers of reynolds and fric
+    dpdx_s = np.multiply(4 / diam, fric, out=reynolds)
+    np.multiply(dpdx_s, rho, out=dpdx_s)
+    np.multiply(dpdx_s, np.square(velocity, out=fric), out=dpdx_s)
+    np.divide(dpdx_s, 2, out=dpdx_s)
 
     return dpdx_s
 
 
+def separable_axis(values, separable=True):
+    """reduce an array to the values that a quantity depending only on it
+    has to be evaluated on, plus the indices that bring the results back to
+    the shape of the original array.
+
+    Maps with the same values in every row (the u_gs maps) are reduced to
+    their first row and the results broadcast back, so the indices are None.
+    Sparse u_gs maps with a single row are already reduced.
+    Other arrays are reduced to their distinct values.
+    If not separable, the array is returned as it is
+    """
+    values = np.asarray(values)
+
+    if not separable:
+        return values, None
+
+    if values.ndim >= 2:
+        first_row = values[..., :1, :]
+        if values.shape[-2] == 1 or np.all(values == first_row):
+            return first_row, None
+
+    axis, inverse = np.unique(values, return_inverse=True)
+    return axis, inverse.reshape(values.shape)
+
+
+def from_separable_axis(axis_values, inverse):
+    """bring values calculated on a separable axis back to the shape of
+    the original array
+    """
+    if inverse is None:
+        return axis_values
+    return axis_values[inverse]
+
+
 def single_fluid_velocity(fluid, pipe):
     """calculate the velocity as if the fluid was the only one
     in the pipe
@@ -65,25 +116,31 @@ class Geometry:
         # dummy constant for readability
         self.var = 2 * self.height_ratio - 1
 
-        # the non dimensional constants
+        # the non dimensional constants, calculated once
+        area_l = self.area_liq()
+        area_g = self.area_gas()
+        perim_l = self.perimeter_liq()
+        perim_g = self.perimeter_gas()
+        perim_interf = self.perimeter_interface()
+
         # areas
-        self.area_l = self.area_liq() * diam ** 2
-        self.area_g = self.area_gas() * diam ** 2
+        self.area_l = area_l * diam ** 2
+        self.area_g = area_g * diam ** 2
         self.area_pipe = (np.pi / 4) * diam ** 2
         # perimeters
-        self.perim_l = self.perimeter_liq() * diam
-        self.perim_g = self.perimeter_gas() * diam
-        self.perim_interf = self.perimeter_interface() * diam
+        self.perim_l = perim_l * diam
+        self.perim_g = perim_g * diam
+        self.perim_interf = perim_interf * diam
         # hydraulic diameters
         self.hydr_diam_l = self.hydraulic_diameter(fluid="liq")
         self.hydr_diam_g = self.hydraulic_diameter(fluid="gas")
         # velocities
         if non_dimensional:
-            self.vel_l = self.velocity_liq()
-            self.vel_g = self.velocity_gas()
+            self.vel_l = (np.pi / 4) / area_l
+            self.vel_g = (np.pi / 4) / area_g
         elif (u_gs is not None) and (u_ls is not None):
-            self.vel_l = self.velocity_liq() * u_ls
-            self.vel_g = self.velocity_gas() * u_gs
+            self.vel_l = (np.pi / 4) / area_l * u_ls
+            self.vel_g = (np.pi / 4) / area_g * u_gs
         else:
             raise ValueError(
                 "Geometry is not nondimensionalized."
@@ -187,10 +244,13 @@ def sagitta_absolute_height(velocity, fluid, pipe):
     # initialize the array
     theta = np.zeros_like(area_ratio)
 
-    # use newton to find it
+    # use newton to find it, the angle is always between 0 and 2 pi
     initial_guess = np.ones_like(area_ratio[valid_mask]) * np.pi / 4
-    theta[valid_mask] = newton(
-        area_function, initial_guess, args=(radius, area_fluid[valid_mask])
+    theta[valid_mask] = root_finding.newton(
+        area_function,
+        initial_guess,
+        args=(radius, area_fluid[valid_mask]),
+        bracket=(0, 2 * np.pi),
     )
 
     # update the values that haven't been solved
@@ -5,34 +5,45 @@ import numpy as np
 from . import general
 
 
-def reynolds(velocity, fluid, pipe):
+def reynolds(velocity, fluid, pipe, out=None):
     """calculate the reynolds number based on the fluid and its velocity
-    in the pipe
+    in the pipe, written to out if it is supplied
     """
-    return velocity * fluid.density * pipe.diameter / fluid.dynamic_viscosity
+    if out is None:
+        return velocity * fluid.density * pipe.diameter / fluid.dynamic_viscosity
 
+    np.multiply(velocity, fluid.density, out=out)
+    np.multiply(out, pipe.diameter, out=out)
+    return np.divide(out, fluid.dynamic_viscosity, out=out)
 
-def lockhart_martinelli(u_gs, u_ls, liquid, gas, pipe):
+
+def lockhart_martinelli(
+    u_gs, u_ls, liquid, gas, pipe, dpdx_gs=None, dpdx_ls=None, out=None
+):
     """calculate the lockhardt martinelli number of the u_gs,
-    u_ls combination
+    u_ls combination. The single phase dpdx values are calculated
+    if not supplied. Written to out if it is supplied
     """
 
     # split in terms for readability
     # numerator
-    dpdx_ls = general.single_phase_dpdx(u_ls, liquid, pipe)
+    if dpdx_ls is None:
+        dpdx_ls = general.single_phase_dpdx(u_ls, liquid, pipe)
 
     # denominator
-    dpdx_gs = general.single_phase_dpdx(u_gs, gas, pipe)
+    if dpdx_gs is None:
+        dpdx_gs = general.single_phase_dpdx(u_gs, gas, pipe)
 
-    lock_mart_number = np.sqrt(dpdx_ls / dpdx_gs)
+    lock_mart_number = np.sqrt(np.divide(dpdx_ls, dpdx_gs, out=out), out=out)
 
     return lock_mart_number
 
 
-def y_gravity(u_gs, u_ls, liquid, gas, pipe):
+def y_gravity(u_gs, u_ls, liquid, gas, pipe, dpdx_gs=None, out=None):
     """calculate the y value which represents the relative
     forces acting on the fluid in the flow direction due to
-    gravity and pressure drop
+    gravity and pressure drop. The single phase gas dpdx is
+    calculated if not supplied. Written to out if it is supplied
     """
     # local variables
     rho_g = gas.density
@@ -40,8 +51,9 @@ def y_gravity(u_gs, u_ls, liquid, gas, pipe):
     grav = pipe.gravity
     beta = pipe.inclination
 
-    dpdx_gs = general.single_phase_dpdx(u_gs, gas, pipe)
+    if dpdx_gs is None:
+        dpdx_gs = general.single_phase_dpdx(u_gs, gas, pipe)
 
-    y_grav = (rho_l - rho_g) * grav * np.sin(beta) / dpdx_gs
+    y_grav = np.divide((rho_l - rho_g) * grav * np.sin(beta), dpdx_gs, out=out)
 
     return y_grav
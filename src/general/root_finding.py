@@ -0,0 +1,340 @@
+"""vectorized root finding for the f(x)=0 formulations of the maps.
+
+Has the same call shape as scipy.optimize.newton, but every point is
+solved independently: points that converge are dropped from the
+iterations, steps are kept inside a bracket with a bisection fallback
+when one is known, and the convergence of each point is reported
+"""
+from collections import namedtuple
+import time
+
+import numpy as np
+
+import instrumentation
+from workspace import Workspace
+
+RootResults = namedtuple(
+    "RootResults", ["root", "converged", "iterations", "function_calls", "residual"]
+)
+
+
+def newton(
+    func,
+    x0,
+    args=(),
+    fprime=None,
+    tol=1.48e-8,
+    maxiter=50,
+    ftol=np.inf,
+    bracket=None,
+    full_output=False,
+    workspace=None,
+    block_size=2 ** 16,
+    fallback=None,
+):
+    """find the roots of func near x0 for every point of the array.
+
+    Uses newton steps if fprime is supplied, secant steps otherwise.
+    The array arguments in args are matched point by point to x0, every
+    other argument is passed as it is.
+
+    If bracket=(lower, upper) is supplied, the points that change sign
+    inside of it keep a bracket around the root and fall back to bisection
+    whenever a step leaves it, the others are kept inside of the bracket.
+    The bracketed points converge when their bracket is narrower than tol,
+    the others when their step is smaller than tol and their |f| is at
+    most ftol.
+
+    The points are solved in blocks of block_size points, so the memory
+    of the iterations doesn't grow with the map. Their state is kept in
+    buffers of the workspace, if one is supplied.
+
+    If fallback guesses are supplied, the points that don't converge from
+    x0 or have an |f| above ftol, like the ones that end up held at an end
+    of the bracket without a root, are solved again from their fallback
+    guess, so x0 can be a warm
+    start from the roots of a similar problem.
+
+    Returns the roots, or a RootResults with the roots, the per point
+    convergence flags and iteration counts, the number of function calls and
+    the per point |f| at the roots if full_output. The results are also
+    reported to the active instrumentation, if there is one
+    """
+    instrument = instrumentation.active()
+    if instrument is not None:
+        started = time.perf_counter()
+
+    if workspace is None:
+        workspace = Workspace()
+
+    x0 = np.asarray(x0, dtype=float)
+    shape = x0.shape
+    size = x0.size
+
+    # split the args into the ones matched point by point and the others
+    args = tuple(_flatten_arg(arg, shape) for arg in args)
+    if bracket is not None:
+        bracket = tuple(
+            _flatten_arg(np.asarray(end, dtype=float), shape) for end in bracket
+        )
+
+    # the results of every point
+    root = x0.ravel().copy()
+    converged = np.zeros(size, dtype=bool)
+    iterations = np.zeros(size, dtype=int)
+    # the absolute value of the function at the roots
+    residual = np.empty(size)
+    function_calls = 0
+
+    # every point is solved independently of the others
+    for start in range(0, size, block_size):
+        block = slice(start, min(start + block_size, size))
+        function_calls += _newton_block(
+            func,
+            root[block],
+            converged[block],
+            iterations[block],
+            residual[block],
+            tuple(
+                (arg[block] if is_point else arg, is_point) for arg, is_point in args
+            ),
+            fprime,
+            tol,
+            maxiter,
+            ftol,
+            None
+            if bracket is None
+            else tuple(end[block] if is_point else end for end, is_point in bracket),
+            workspace,
+        )
+
+    if fallback is not None:
+        fallback = np.broadcast_to(np.asarray(fallback, dtype=float), shape).ravel()
+        # the points that didn't converge, including the ones held at an
+        # end of the bracket, and the ones whose function isn't finite or
+        # small enough
+        failed = np.flatnonzero(~converged | ~np.isfinite(residual) | (residual > ftol))
+        for start in range(0, failed.size, block_size):
+            # the points are gathered, solved again and scattered back
+            block = failed[start : start + block_size]
+            block_root = fallback[block].copy()
+            block_converged = np.zeros(block.size, dtype=bool)
+            block_iterations = np.zeros(block.size, dtype=int)
+            block_residual = np.empty(block.size)
+            function_calls += _newton_block(
+                func,
+                block_root,
+                block_converged,
+                block_iterations,
+                block_residual,
+                tuple(
+                    (arg[block] if is_point else arg, is_point)
+                    for arg, is_point in args
+                ),
+                fprime,
+                tol,
+                maxiter,
+                ftol,
+                None
+                if bracket is None
+                else tuple(
+                    end[block] if is_point else end for end, is_point in bracket
+                ),
+                workspace,
+            )
+            root[block] = block_root
+            converged[block] = block_converged
+            iterations[block] += block_iterations
+            residual[block] = block_residual
+
+    root = root.reshape(shape)
+    if instrument is not None:
+        instrument.record_solve(
+            getattr(func, "__name__", repr(func)),
+            root,
+            converged,
+            iterations,
+            function_calls,
+            time.perf_counter() - started,
+            residual,
+        )
+    if full_output:
+        return RootResults(
+            root,
+            converged.reshape(shape),
+            iterations.reshape(shape),
+            function_calls,
+            residual.reshape(shape),
+        )
+    return root
+
+
+def _newton_block(
+    func,
+    root,
+    converged,
+    iterations,
+    residual,
+    args,
+    fprime,
+    tol,
+    maxiter,
+    ftol,
+    bracket,
+    workspace,
+):
+    """solve a block of points, updating their root, converged,
+    iterations and residual arrays in place. Returns the number of function
+    calls
+    """
+    size = root.size
+    function_calls = 0
+
+    def evaluate(x, index):
+        """evaluate the function on the points at index"""
+        nonlocal function_calls
+        function_calls += 1
+        point_args = tuple(arg[index] if is_point else arg for arg, is_point in args)
+        return np.asarray(func(x.copy(), *point_args), dtype=float)
+
+    # the initial bracket
+    everywhere = slice(None)
+    lower = workspace.empty(size)
+    upper = workspace.empty(size)
+    if bracket is not None:
+        lower[:] = bracket[0]
+        upper[:] = bracket[1]
+        f_lower = evaluate(lower, everywhere)
+        f_upper = evaluate(upper, everywhere)
+        bracketed = np.sign(f_lower) * np.sign(f_upper) < 0
+        np.clip(root, lower, upper, out=root)
+    else:
+        lower.fill(-np.inf)
+        upper.fill(np.inf)
+        f_lower = np.full(size, np.nan)
+        bracketed = np.zeros(size, dtype=bool)
+
+    # the first two points of the iterations
+    f_root = evaluate(root, everywhere)
+    if fprime is None:
+        # same secant starting point as scipy
+        previous = np.multiply(root, 1 + 1e-4, out=workspace.empty(size))
+        previous += np.where(root >= 0, 1e-4, -1e-4)
+        np.clip(previous, lower, upper, out=previous)
+        f_previous = evaluate(previous, everywhere)
+    converged[f_root == 0] = True
+
+    # the first point is an end of the brackets it is inside of
+    first_lower = (
+        bracketed & np.isfinite(f_root) & (np.sign(f_root) == np.sign(f_lower))
+    )
+    first_upper = bracketed & np.isfinite(f_root) & ~first_lower
+    lower[first_lower] = root[first_lower]
+    f_lower[first_lower] = f_root[first_lower]
+    upper[first_upper] = root[first_upper]
+
+    active = np.flatnonzero(~converged & np.isfinite(f_root))
+    was_short = np.zeros(size, dtype=bool)
+    last_steps = np.full(size, np.inf)
+    steps_before = np.full(size, np.inf)
+    for _ in range(maxiter):
+        if active.size == 0:
+            break
+
+        x, f_x = root[active], f_root[active]
+
+        # the newton or secant step
+        if fprime is not None:
+            point_args = tuple(
+                arg[active] if is_point else arg for arg, is_point in args
+            )
+            slope = np.asarray(fprime(x.copy(), *point_args), dtype=float)
+        else:
+            slope = (f_x - f_previous[active]) / (x - previous[active])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_new = x - f_x / slope
+
+        # keep the steps inside of the bracket, a converged step can land
+        # on the end that the previous iteration moved
+        low, high = lower[active], upper[active]
+        f_low = f_lower[active]
+        is_bracketed = bracketed[active]
+        outside = ~np.isfinite(x_new) | (x_new < low) | (x_new > high)
+        # after half of the iterations, a bracketed step that isn't shorter
+        # than half of the step before the last one is bisected too, so the
+        # steps can't keep jumping around the root without the bracket
+        # closing on it. The earlier steps are left to the secant, so it
+        # finds the same root as before where there are more than one
+        slow = (np.abs(x_new - x) > steps_before[active] / 2) & (
+            iterations[active] >= maxiter // 2
+        )
+        steps_before[active] = last_steps[active]
+        bisect = is_bracketed & (outside | slow)
+        if np.any(bisect):
+            # only the bracketed points have finite ends to bisect
+            x_new = np.where(bisect, (low + high) / 2, x_new)
+        # the other points are held at the ends, where they have no root
+        clipped = ~is_bracketed & outside
+        x_new = np.clip(x_new, low, high)
+        step = np.abs(x_new - x)
+        last_steps[active] = step
+        small_step = step < tol
+        # a second bracketed step in a row shorter than tol goes tol / 2
+        # towards the other end instead, so the bracket either closes on
+        # the root or the iterations move on from a secant that stalls
+        short = is_bracketed & small_step
+        nudge = short & was_short[active]
+        was_short[active] = short
+        if np.any(nudge):
+            towards_upper = np.sign(f_x[nudge]) == np.sign(f_low[nudge])
+            x_new[nudge] = x[nudge] + np.where(towards_upper, tol, -tol) / 2
+        f_new = evaluate(x_new, active)
+        iterations[active] += 1
+
+        # shrink the bracket around the root
+        same_side = np.sign(f_new) == np.sign(f_low)
+        finite = np.isfinite(f_new)
+        move_lower = is_bracketed & finite & same_side
+        move_upper = is_bracketed & finite & ~same_side
+        lower[active[move_lower]] = x_new[move_lower]
+        f_lower[active[move_lower]] = f_new[move_lower]
+        upper[active[move_upper]] = x_new[move_upper]
+
+        # update the iterations
+        if fprime is None:
+            previous[active], f_previous[active] = x, f_x
+        root[active], f_root[active] = x_new, f_new
+
+        # check which points have converged, a step that was cut short by
+        # the ends or that leaves a large |f| doesn't count
+        done = small_step & ~clipped
+        if np.isfinite(ftol):
+            done &= np.abs(f_new) <= ftol
+        done = np.where(is_bracketed, upper[active] - lower[active] < tol, done)
+        done |= f_new == 0
+        converged[active[done & finite]] = True
+        # a closed bracket has the root at its end with the smallest |f|
+        closed = np.flatnonzero(done & finite & is_bracketed)
+        closed = closed[np.abs(f_x[closed]) < np.abs(f_new[closed])]
+        root[active[closed]], f_root[active[closed]] = x[closed], f_x[closed]
+
+        # points that can't make any progress, like the ones held at an
+        # end, are dropped as well without converging
+        stuck = ~finite | (~is_bracketed & (x_new == x))
+        active = active[~(done | stuck)]
+
+    np.abs(f_root, out=residual)
+    workspace.release(lower, upper)
+    if fprime is None:
+        workspace.release(previous)
+
+    return function_calls
+
+
+def _flatten_arg(arg, shape):
+    """flatten the arguments that hold one value per point. Returns the
+    argument and if it is matched point by point
+    """
+    if isinstance(arg, np.ndarray) and arg.ndim > 0:
+        return np.broadcast_to(arg, shape).ravel(), True
+    return arg, False
@@ -6,8 +6,6 @@ and the velocity maps
 
 import numpy as np
 from config import Config
-from scipy import interpolate
-from scipy.ndimage import gaussian_filter
 
 
 def generate_velocity_maps(
@@ -16,14 +14,22 @@ def generate_velocity_maps(
     max_u_ls=Config.MAX_ULS,
     min_u_gs=Config.MIN_UGS,
     max_u_gs=Config.MAX_UGS,
+    sparse=False,
 ):
     """create maps of corresponding u_gs and u_ls
-    where u_gs is the x axis and u_ls is the y axis
+    where u_gs is the x axis and u_ls is the y axis.
+
+    If sparse, the maps are the (1, datapoints) u_gs row and the
+    (datapoints, 1) u_ls column, which broadcast to the full maps in the
+    calculations, so the values that only depend on one of them are only
+    calculated along its axis
     """
 
     # create the arrays
     u_gs_array = np.geomspace(min_u_gs, max_u_gs, num=datapoints)
     u_ls_array = np.geomspace(min_u_ls, max_u_ls, num=datapoints)
+    if sparse:
+        return u_gs_array[np.newaxis, :], u_ls_array[:, np.newaxis]
 
     # tile them up in the correct dimension
     u_gs_map = np.tile(u_gs_array, (datapoints, 1))
@@ -38,12 +44,15 @@ def generate_velocity_data_close_to_edges(
     u_ls,
     refined_datapoints=Config.NUMBER_DATAPOINTS,
     sigma=1,
-    upscale=10,
+    *,
+    rng=None,
 ):
     """get a new velocity map which takes into account the edges of the
     rough map. The velocity map uses both the original rough map points plus
-    a set of refined points which are chosen based on the edges detected on the
-    rough.
+    refined_datapoints ** 2 refined points which are sampled close to the
+    edges detected on the rough map with sample_close_to_edges. rng is a
+    keyword only numpy Generator or seed, so the upscale argument that used
+    to follow sigma can't be taken for a seed.
 
     This is not used for plotting, but could theoretically be used to have better guesses
     to solve for the transitions
@@ -51,29 +60,15 @@ def generate_velocity_data_close_to_edges(
     # detect the edges of the rough map
     edges_map = detect_edges(rough_map)
 
-    # get map with the probability distribution and u_gs and u_ls maps
-    # to sample from
-    probability_map, u_gs_sample, u_ls_sample = generate_probability_map(
-        edges_map, u_gs, u_ls, sigma, upscale
+    # get the random sample of points close to the edges
+    u_gs_refined, u_ls_refined = sample_close_to_edges(
+        edges_map, u_gs, u_ls, refined_datapoints ** 2, sigma, rng=rng
     )
-    # tile them up in the correct dimension
-    u_gs_map = np.tile(u_gs_sample, (u_gs_sample.size, 1))
-    u_ls_map = np.tile(u_ls_sample, (u_ls_sample.size, 1)).T
-
-    # get the original ugs and uls
-    u_gs_rough = u_gs.ravel()
-    u_ls_rough = u_ls.ravel()
-
-    # get the random sample of indexes using the probability map
-    indexes_to_choose = np.arange(probability_map.size)
-    indexes = np.random.choice(
-        indexes_to_choose,
-        size=refined_datapoints ** 2,
-        replace=False,
-        p=probability_map.ravel(),
+
+    # get the original ugs and uls, of every point if the maps are sparse
+    u_gs_rough, u_ls_rough = (
+        np.ravel(value) for value in np.broadcast_arrays(u_gs, u_ls)
     )
-    u_gs_refined = u_gs_map.ravel()[indexes]
-    u_ls_refined = u_ls_map.ravel()[indexes]
 
     # join the two
     u_gs_refined = np.append(u_gs_rough, u_gs_refined)
@@ -87,53 +82,54 @@ def detect_edges(parsed_map):
     single value section
     """
 
+    # points that differ from the previous point in either direction,
+    # compared instead of subtracted so that uint8 maps don't wrap around
+    edges_map = np.zeros(np.shape(parsed_map), dtype=bool)
     # edges in the x direction
-    edges_x = np.diff(parsed_map, axis=0, prepend=parsed_map[:1, :])
+    edges_map[1:, :] |= parsed_map[1:, :] != parsed_map[:-1, :]
     # edges in the y direction
-    edges_y = np.diff(parsed_map, axis=1, prepend=parsed_map[:, :1])
+    edges_map[:, 1:] |= parsed_map[:, 1:] != parsed_map[:, :-1]
 
-    edges_map = ((edges_x != 0) | (edges_y != 0)).astype(float)
+    return edges_map.astype(float)
 
-    return edges_map
 
+def sample_close_to_edges(edges_map, u_gs, u_ls, samples, sigma=1, *, rng=None):
+    """draw random points with a high likelihood of being close to the
+    edges of a map calculated on the velocity maps of generate_velocity_maps.
+    Every point falls in a cell of the map with the probability of the edges
+    smoothed by a gaussian, and then uniformly inside of the cell on the
+    logarithmic axes, so the cost only grows with the samples and the size
+    of the map. rng is a numpy Generator or a seed.
 
-def generate_probability_map(edges_map, u_gs, u_ls, sigma=1, upsample=10):
-    """generate a probability distribution for points,
-    with a high likelihood of putting points close to the
-    edges.
-    The upsample disctates how fine the probability distribution
-    will be. The actual probability distribution is a discrete pdf,
-    but the higher the number of points the more it looks like a continuous pdf
+    Returns the u_gs and u_ls arrays of the points, which are empty if the
+    map has no edges
     """
+    # scipy is only needed here, so it is imported when it is used
+    from scipy.ndimage import gaussian_filter
 
-    # probability datapoints
-    prob_datapoints = Config.NUMBER_DATAPOINTS * upsample
+    rng = np.random.default_rng(rng)
 
     # first smooth out the edges
-    probability_map = gaussian_filter(edges_map, sigma=sigma)
-
-    # create an interpolation function with it
-    size_x = probability_map.shape[0]
-    size_y = probability_map.shape[1]
-    x_initial = np.arange(size_x)
-    y_initial = np.arange(size_y)
-    interpolation_function = interpolate.interp2d(
-        x_initial, y_initial, z=probability_map
+    probability_map = gaussian_filter(np.asarray(edges_map, dtype=float), sigma=sigma)
+    cumulative = np.cumsum(probability_map.ravel())
+    if cumulative.size == 0 or cumulative[-1] <= 0:
+        return np.empty(0), np.empty(0)
+
+    # the cell of every point, by inverting the cumulative distribution
+    cells = np.searchsorted(
+        cumulative, rng.random(samples) * cumulative[-1], side="right"
+    )
+    rows, columns = np.divmod(
+        np.minimum(cells, cumulative.size - 1), edges_map.shape[1]
     )
 
-    # create new vectors with the same range but more points
-    x_new = np.linspace(start=0, stop=size_x, num=prob_datapoints)
-    y_new = np.linspace(start=0, stop=size_y, num=prob_datapoints)
-
-    # upsample the probability map
-    probability_map = interpolation_function(x_new, y_new)
-
-    # upsample the u_gs and u_ls arrays
-    # create the arrays
-    u_gs_array = np.geomspace(u_gs.min(), u_gs.max(), num=prob_datapoints)
-    u_ls_array = np.geomspace(u_ls.min(), u_ls.max(), num=prob_datapoints)
-
-    # normalize it so that it sums to 1
-    probability_map /= np.abs(probability_map).sum()
+    # a uniform position inside of the cell, between the halfway points to
+    # its neighbours and kept inside of the map
+    log_u_gs = np.log10(np.asarray(u_gs)[0, :])
+    log_u_ls = np.log10(np.asarray(u_ls)[:, 0])
+    columns = np.clip(columns + rng.uniform(-0.5, 0.5, samples), 0, log_u_gs.size - 1)
+    rows = np.clip(rows + rng.uniform(-0.5, 0.5, samples), 0, log_u_ls.size - 1)
+    u_gs_sample = 10 ** np.interp(columns, np.arange(log_u_gs.size), log_u_gs)
+    u_ls_sample = 10 ** np.interp(rows, np.arange(log_u_ls.size), log_u_ls)
 
-    return probability_map, u_gs_array, u_ls_array
+    return u_gs_sample, u_ls_sample
@@ -0,0 +1,150 @@
+"""
+This module measures where the time of a map computation goes. It is opt
+in: the calculations only report to an Instrumentation while it is active,
+and otherwise skip the measurements
+"""
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+import time
+import tracemalloc
+
+import numpy as np
+
+# the instrumentation the calculations report to, if any
+_ACTIVE = ContextVar("instrumentation", default=None)
+
+
+class Instrumentation:
+    """
+    collects the events of the calculations run while it is active: the
+    wall time of every stage, the iterations, function evaluations,
+    unconverged points and largest residual of every solve and the time
+    spent on friction factors. If trace_memory, the peak allocation of
+    every stage is traced with tracemalloc, which slows the calculations
+    down.
+
+    Every event is a dict, which is also passed to callback when it is
+    recorded
+    """
+
+    def __init__(self, callback=None, trace_memory=False):
+        self.callback = callback
+        self.trace_memory = trace_memory
+        self.events = []
+        # the open stages, as [name, traced memory at the start, peak]
+        self._stages = []
+
+    def record(self, kind, **values):
+        """record an event of the current stage"""
+        event = {
+            "kind": kind,
+            "stage": self._stages[-1][0] if self._stages else None,
+            **values,
+        }
+        self.events.append(event)
+        if self.callback is not None:
+            self.callback(event)
+        return event
+
+    @contextmanager
+    def stage(self, name):
+        """measure the wall time, and the peak allocation if traced, of the
+        calculations inside of the with block
+        """
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        memory = 0
+        if self.trace_memory:
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        self._stages.append([name, memory, memory])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            _, memory, peak = self._stages[-1]
+            peak_bytes = None
+            if self.trace_memory:
+                # the peaks of the inner stages were reset by them
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                peak_bytes = peak - memory
+                if len(self._stages) > 1:
+                    self._stages[-2][2] = max(self._stages[-2][2], peak)
+            if started_tracing:
+                tracemalloc.stop()
+
+            self._stages.pop()
+            self.record("stage", name=name, seconds=seconds, peak_bytes=peak_bytes)
+
+    def record_solve(
+        self, name, root, converged, iterations, function_calls, seconds, residual=None
+    ):
+        """record the results of a solve of root_finding.newton. residual
+        is the absolute value of the function at the roots, whose largest
+        finite value is far from zero if some points didn't reach a root
+        """
+        residual = np.asarray([] if residual is None else residual)
+        return self.record(
+            "solve",
+            name=name,
+            seconds=seconds,
+            points=int(np.size(root)),
+            function_calls=int(function_calls),
+            max_iterations=int(np.max(iterations, initial=0)),
+            mean_iterations=float(np.mean(iterations)) if np.size(iterations) else 0.0,
+            unconverged=int(np.size(converged) - np.count_nonzero(converged)),
+            nan=int(np.count_nonzero(np.isnan(root))),
+            max_residual=float(np.max(residual[np.isfinite(residual)], initial=0.0)),
+        )
+
+    def report(self):
+        """summarize the events: the stages, the solves, the totals of the
+        friction factors and the total unconverged and nan points
+        """
+        solves = [event for event in self.events if event["kind"] == "solve"]
+        friction = [event for event in self.events if event["kind"] == "friction"]
+        return {
+            "stages": [event for event in self.events if event["kind"] == "stage"],
+            "solves": solves,
+            "friction": {
+                "calls": len(friction),
+                "points": sum(event["points"] for event in friction),
+                "seconds": sum(event["seconds"] for event in friction),
+            },
+            "unconverged": sum(event["unconverged"] for event in solves),
+            "nan": sum(event["nan"] for event in solves),
+            "maps": [event for event in self.events if event["kind"] == "map"],
+        }
+
+
+def active():
+    """the instrumentation the calculations report to, or None"""
+    return _ACTIVE.get()
+
+
+@contextmanager
+def activate(instrumentation):
+    """make the calculations inside of the with block report to the
+    instrumentation. Nothing is measured if it is None
+    """
+    if instrumentation is None:
+        yield None
+        return
+    token = _ACTIVE.set(instrumentation)
+    try:
+        yield instrumentation
+    finally:
+        _ACTIVE.reset(token)
+
+
+def stage(name):
+    """a stage of the active instrumentation, or a block that does nothing
+    if there is none
+    """
+    instrumentation = _ACTIVE.get()
+    if instrumentation is None:
+        return nullcontext()
+    return instrumentation.stage(name)
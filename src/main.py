@@ -19,7 +19,7 @@ if __name__ == "__main__":
     gas_massflow = total_mass_flow * quality
 
     # get the ugs and uls map data
-    ugs_temp, uls_temp = generate_data.generate_velocity_maps()
+    ugs_temp, uls_temp = generate_data.generate_velocity_maps(sparse=True)
 
     # get the fluid objects
     liq_temp = fluids.Liquid(
@@ -33,18 +33,25 @@ if __name__ == "__main__":
     )
 
     # for all the inclinations in barnea 1987
-    for inclination in [-90, -80, -30, -1, 0, 1, 30, 80, 90]:
-        # get the pipe object
-        pipe_temp = fluids.Pipe(diameter=0.3, inclination=inclination, roughness=0.001)
+    inclinations = [-90, -80, -30, -1, 0, 1, 30, 80, 90]
 
-        # calculate the mapping data
-        categories = parse_maps.get_categories_maps(
-            ugs_temp, uls_temp, liq_temp, gas_temp, pipe_temp
-        )
+    # get the pipe object with one scenario per inclination
+    pipe_temp = fluids.Pipe(diameter=0.3, inclination=inclinations, roughness=0.001)
+
+    # calculate the mapping data of all the inclinations at once
+    categories = parse_maps.get_categories_maps(
+        ugs_temp, uls_temp, liq_temp, gas_temp, pipe_temp
+    )
 
-        # plot each of the inclinations
+    # plot each of the inclinations
+    for index in range(len(inclinations)):
         fig_temp, ax = visualization.plot_map(
-            categories, liq_temp, gas_temp, pipe_temp, ugs_temp, uls_temp
+            categories[index],
+            liq_temp,
+            gas_temp,
+            fluids.select_scenario(pipe_temp, index),
+            ugs_temp,
+            uls_temp,
         )
 
     # stop the program before it quits to display maps if not running this
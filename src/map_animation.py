@@ -0,0 +1,138 @@
+"""
+This module animates sequences of category maps, like sweeps of the pipe
+inclination. The figure, legend and image are built once, and every frame
+only replaces the data of the image, the marker and the title, so the frame
+rate is limited by the map computations and not by matplotlib
+"""
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+
+from config import Config
+from evaluation import WarmStart
+import fluids
+import general
+import parse_maps
+import visualization
+
+
+class MapAnimation:
+    """
+    figure that draws category maps calculated on the velocity maps of
+    generate_data.generate_velocity_maps like visualization.plot_map_raster,
+    one frame at a time. Every frame is a (category_map, liquid, gas, pipe)
+    scenario
+    """
+
+    def __init__(self, u_gs_map, u_ls_map, max_pixels=visualization.RASTER_PIXELS):
+        shape = np.broadcast_shapes(np.shape(u_gs_map), np.shape(u_ls_map))
+        self.step = visualization.raster_step(shape, max_pixels)
+        self.fig, self.axs = plt.subplots(figsize=(7, 7))
+
+        # an empty image of the size of the frames
+        rows, columns = (-(-size // self.step) for size in shape)
+        self.image = self.axs.imshow(
+            np.zeros((rows, columns, 4), dtype=np.uint8),
+            origin="lower",
+            extent=visualization.log_extent(
+                u_gs_map[0, :: self.step], u_ls_map[:: self.step, 0]
+            ),
+            interpolation="nearest",
+            aspect="auto",
+        )
+        visualization.set_log_ticks(self.axs)
+
+        (self.marker,) = self.axs.plot(
+            [np.nan], [np.nan], marker="x", color="black", mew=2, markersize=10
+        )
+        # every category can show up in some frame
+        self.axs.legend(
+            handles=visualization.legend_elements(
+                np.array(list(Config.CATEGORIES.values()))
+            ),
+            bbox_to_anchor=(1.04, 1),
+            loc="upper left",
+        )
+        self.axs.set_xlabel(r"$U_{Gs}$")
+        self.axs.set_ylabel(r"$U_{Ls}$")
+        self.title = self.axs.set_title(" ")
+        plt.tight_layout()
+
+    def update(self, frame):
+        """draw a (category_map, liquid, gas, pipe) frame and return the
+        artists that changed
+        """
+        category_map, liquid, gas, pipe = frame
+        self.image.set_data(visualization.category_rgba(category_map, step=self.step))
+        self.marker.set_data(
+            [np.log10(general.single_fluid_velocity(gas, pipe))],
+            [np.log10(general.single_fluid_velocity(liquid, pipe))],
+        )
+        self.title.set_text(
+            f"Inclination = ${pipe.inclination*180/np.pi:.1f}{{\\degree}}$"
+        )
+        return self.image, self.marker, self.title
+
+    def animate(self, frames, frame_count=None, interval=50, **kwargs):
+        """animate an iterable of frames, which can be a generator so only
+        one map is kept in memory at a time. frame_count is the number of
+        frames to save if frames has no length. The frames are not cached,
+        so the animation can't be replayed from a generator once it ended.
+        The keyword arguments go to matplotlib.animation.FuncAnimation
+        """
+        if frame_count is None and hasattr(frames, "__len__"):
+            frame_count = len(frames)
+        return FuncAnimation(
+            self.fig,
+            self.update,
+            frames=frames,
+            save_count=frame_count,
+            interval=interval,
+            cache_frame_data=False,
+            **kwargs,
+        )
+
+
+def inclination_frames(
+    u_gs_map, u_ls_map, liquid, gas, pipe, inclinations, warm_start=False
+):
+    """generate the (category_map, liquid, gas, pipe) frames of a pipe at
+    every inclination in degrees, calculating each map when it is needed.
+    If warm_start, the solves of every map start from the previous one like
+    in sweep.sweep_maps
+    """
+    warm_start = WarmStart() if warm_start else None
+    for inclination in inclinations:
+        inclined = fluids.select_scenario(pipe, 0)
+        inclined.inclination = inclination * np.pi / 180
+        with np.errstate(all="ignore"):
+            category_map = parse_maps.get_categories_maps(
+                u_gs_map, u_ls_map, liquid, gas, inclined, warm_start=warm_start
+            )
+        yield category_map, liquid, gas, inclined
+
+
+def animate_inclinations(
+    u_gs_map,
+    u_ls_map,
+    liquid,
+    gas,
+    pipe,
+    inclinations=range(-90, 91),
+    warm_start=False,
+    **kwargs,
+):
+    """animate the maps of a pipe over a sweep of inclinations in degrees,
+    from -90 to 90 in steps of 1 by default, warm started like in
+    inclination_frames. The keyword arguments go to MapAnimation.animate.
+    Returns the animation, which can be shown with plt.show or exported
+    with its save method
+    """
+    animation = MapAnimation(u_gs_map, u_ls_map)
+    return animation.animate(
+        inclination_frames(
+            u_gs_map, u_ls_map, liquid, gas, pipe, inclinations, warm_start
+        ),
+        frame_count=len(inclinations),
+        **kwargs,
+    )
@@ -0,0 +1,155 @@
+"""
+This module writes and reads atlases, files with a collection of
+precomputed category maps on the same velocity maps. An atlas has a small
+json header with the velocity axes and the parameters of every scenario,
+followed by the maps as one contiguous block of uint8 categories, so single
+maps or slices of the maps are read straight from the file with np.memmap
+"""
+import json
+import struct
+
+import numpy as np
+
+from config import Config
+import fluids
+
+MAGIC = b"TPFMAP"
+VERSION = 1
+# the maps start at a multiple of the alignment
+ALIGNMENT = 64
+
+# magic, version and length of the json header
+_PREFIX = struct.Struct("<6sHQ")
+
+
+def write_atlas(path, u_gs, u_ls, scenarios, category_maps):
+    """write an atlas of the category maps of the (liquid, gas, pipe)
+    scenarios, calculated on the velocity maps from generate_velocity_maps.
+
+    category_maps can be an array or any iterable with one map per scenario,
+    so the maps can be written as they are calculated
+    """
+    scenarios = list(scenarios)
+    u_gs_axis = np.asarray(u_gs)[0, :]
+    u_ls_axis = np.asarray(u_ls)[:, 0]
+    shape = (len(scenarios), u_ls_axis.size, u_gs_axis.size)
+
+    header = {
+        "u_gs": u_gs_axis.tolist(),
+        "u_ls": u_ls_axis.tolist(),
+        "shape": shape,
+        "no_category": Config.NO_CATEGORY,
+        "scenarios": [
+            {
+                "fingerprints": [obj.fingerprint() for obj in scenario],
+                "liquid": _parameters(scenario[0]),
+                "gas": _parameters(scenario[1]),
+                "pipe": _parameters(scenario[2]),
+            }
+            for scenario in scenarios
+        ],
+    }
+    encoded = json.dumps(header).encode()
+    # pad the header so the maps are aligned
+    offset = _PREFIX.size + len(encoded)
+    encoded += b" " * (-offset % ALIGNMENT)
+
+    written = 0
+    with open(path, "wb") as file:
+        file.write(_PREFIX.pack(MAGIC, VERSION, len(encoded)))
+        file.write(encoded)
+        for category_map in category_maps:
+            if np.shape(category_map) != shape[1:]:
+                raise ValueError(
+                    f"map of shape {np.shape(category_map)}, expected {shape[1:]}"
+                )
+            file.write(np.ascontiguousarray(category_map, dtype=np.uint8).tobytes())
+            written += 1
+
+    if written != len(scenarios):
+        raise ValueError(f"{written} maps for {len(scenarios)} scenarios")
+
+
+class MapAtlas:
+    """
+    an atlas file opened for reading. The maps are memory mapped, so only
+    the parts that are used are read from the file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            magic, version, length = _PREFIX.unpack(file.read(_PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a map atlas")
+            if version != VERSION:
+                raise ValueError(f"unsupported atlas version {version}")
+            self.header = json.loads(file.read(length))
+
+        self.u_gs_axis = np.array(self.header["u_gs"])
+        self.u_ls_axis = np.array(self.header["u_ls"])
+        self.scenarios = self.header["scenarios"]
+        self._index = {
+            tuple(scenario["fingerprints"]): index
+            for index, scenario in enumerate(self.scenarios)
+        }
+
+        # the uint8 categories of every map, without copies
+        self.data = np.memmap(
+            path,
+            dtype=np.uint8,
+            mode="r",
+            offset=_PREFIX.size + length,
+            shape=tuple(self.header["shape"]),
+        )
+
+    def __len__(self):
+        return len(self.scenarios)
+
+    def velocity_maps(self, sparse=False):
+        """the u_gs and u_ls maps of the atlas, sparse like in
+        generate_data.generate_velocity_maps if sparse
+        """
+        if sparse:
+            return self.u_gs_axis[np.newaxis, :], self.u_ls_axis[:, np.newaxis]
+        u_gs_map = np.tile(self.u_gs_axis, (self.u_ls_axis.size, 1))
+        u_ls_map = np.tile(self.u_ls_axis, (self.u_gs_axis.size, 1)).T
+        return u_gs_map, u_ls_map
+
+    def category_map(self, index):
+        """get a map as a read only view of the file"""
+        return self.data[index]
+
+    def scenario(self, index):
+        """get the liquid, gas and pipe objects of a scenario"""
+        scenario = self.scenarios[index]
+        return (
+            fluids.Liquid(**scenario["liquid"]),
+            fluids.Gas(**scenario["gas"]),
+            _pipe(scenario["pipe"]),
+        )
+
+    def find(self, liquid, gas, pipe):
+        """get the index of the scenario with the same parameters, or None"""
+        fingerprints = (liquid.fingerprint(), gas.fingerprint(), pipe.fingerprint())
+        return self._index.get(fingerprints)
+
+
+def _parameters(obj):
+    """the parameters of a fluid or pipe object, as stored in it"""
+    parameters = {name: float(value) for name, value in vars(obj).items()}
+    if isinstance(obj, fluids.Pipe):
+        # calculated from the diameter
+        del parameters["area"]
+    return parameters
+
+
+def _pipe(parameters):
+    """create the pipe of a scenario, with the inclination in radians
+    as it is stored
+    """
+    parameters = dict(parameters)
+    inclination = parameters.pop("inclination")
+    pipe = fluids.Pipe(inclination=0, **parameters)
+    pipe.inclination = inclination
+    return pipe
@@ -0,0 +1,150 @@
+"""
+This module caches category maps by the content of their inputs. A map is
+looked up by the fingerprints of the fluids and pipe, the velocity grid and
+the configured backends, first in a least recently used cache in memory and
+then in a directory on disk, before being calculated
+"""
+from collections import OrderedDict
+from functools import lru_cache
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from config import Config
+import parse_maps
+
+# changes whenever the maps calculated for the same inputs change
+CACHE_VERSION = 2
+
+
+class MapCache:
+    """
+    two tier cache of category maps. The memory tier keeps the
+    memory_items most recently used maps, the disk tier keeps maps as .npy
+    files in directory and removes the least recently used ones when they
+    take more than disk_bytes. Without a directory only memory is used
+    """
+
+    def __init__(
+        self,
+        directory=Config.CACHE_DIRECTORY,
+        memory_items=Config.CACHE_MEMORY_ITEMS,
+        disk_bytes=Config.CACHE_DISK_BYTES,
+    ):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        """get a copy of the cached map of key, or None if it isn't cached"""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key].copy()
+
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            category_map = np.load(path)
+            # the access time for the eviction
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+        self._remember(key, category_map)
+        return category_map.copy()
+
+    def put(self, key, category_map):
+        """store a copy of the map of key in both tiers"""
+        category_map = np.array(category_map)
+        self._remember(key, category_map)
+
+        if self.directory is None:
+            return
+        # written to a temporary file first, so other processes never
+        # read a partial map
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(handle, "wb") as file:
+            np.save(file, category_map)
+        os.replace(temporary, self._path(key))
+        self._evict()
+
+    def clear(self):
+        """remove every map from both tiers"""
+        self._memory.clear()
+        if self.directory is None:
+            return
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                os.remove(entry.path)
+
+    def _remember(self, key, category_map):
+        """add a map to the memory tier, dropping the least recently used"""
+        self._memory[key] = category_map
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        """the file of a key in the disk tier"""
+        return os.path.join(self.directory, key + ".npy")
+
+    def _evict(self):
+        """remove the least recently used files while the disk tier is
+        larger than disk_bytes
+        """
+        files = [
+            (entry.stat(), entry.path)
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(".npy")
+        ]
+        total = sum(stat.st_size for stat, _ in files)
+        for stat, path in sorted(files, key=lambda item: item[0].st_mtime):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= stat.st_size
+
+
+@lru_cache(maxsize=None)
+def default_cache():
+    """the cache with the sizes and directory of Config"""
+    return MapCache()
+
+
+def map_key(u_gs, u_ls, liquid, gas, pipe):
+    """get the key of a map from the fingerprints of the fluids and pipe,
+    the velocity maps and the backends that the maps depend on
+    """
+    digest = hashlib.sha256(str((CACHE_VERSION, Config.FRICTION_BACKEND)).encode())
+    for obj in (liquid, gas, pipe):
+        digest.update(obj.fingerprint().encode())
+    for velocity in (u_gs, u_ls):
+        velocity = np.ascontiguousarray(velocity, dtype=float)
+        digest.update(str(velocity.shape).encode())
+        digest.update(velocity.tobytes())
+    return digest.hexdigest()
+
+
+def get_categories_maps(u_gs, u_ls, liquid, gas, pipe, cache=None):
+    """same as parse_maps.get_categories_maps, but returns the cached map
+    if the same map has been calculated before
+    """
+    if cache is None:
+        cache = default_cache()
+
+    key = map_key(u_gs, u_ls, liquid, gas, pipe)
+    category_map = cache.get(key)
+    if category_map is None:
+        category_map = parse_maps.get_categories_maps(u_gs, u_ls, liquid, gas, pipe)
+        cache.put(key, category_map)
+    return category_map
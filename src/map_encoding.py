@@ -0,0 +1,86 @@
+"""
+This module converts uint8 category maps to compact representations, one
+bit packed layer per category, or a run length encoding for storage and
+transfer of the maps
+"""
+import struct
+
+import numpy as np
+
+from config import Config
+
+MAGIC = b"TPFR"
+# magic and number of dimensions
+_PREFIX = struct.Struct("<4sB")
+
+
+def pack_layers(category_map):
+    """get the bit packed layers of every category of Config.CATEGORIES,
+    as an array of (n_categories, ..., ceil(n_ugs / 8)) bytes
+    """
+    category_map = np.asarray(category_map)
+    layers = np.empty(
+        (len(Config.CATEGORIES),)
+        + category_map.shape[:-1]
+        + (-(-category_map.shape[-1] // 8),),
+        dtype=np.uint8,
+    )
+    # one category at a time, to never hold more than one boolean layer
+    for index, value in enumerate(Config.CATEGORIES.values()):
+        layers[index] = np.packbits(category_map == value, axis=-1)
+    return layers
+
+
+def unpack_layers(layers, shape):
+    """get the category map of the shape back from its packed layers"""
+    category_map = np.full(shape, Config.NO_CATEGORY, dtype=np.uint8)
+    for index, value in enumerate(Config.CATEGORIES.values()):
+        in_layer = np.unpackbits(layers[index], axis=-1, count=shape[-1]).view(bool)
+        category_map[in_layer] = value
+    return category_map
+
+
+def layer(layers, category, shape):
+    """get the boolean map of a single category from the packed layers"""
+    index = list(Config.CATEGORIES).index(category)
+    return np.unpackbits(layers[index], axis=-1, count=shape[-1]).view(bool)
+
+
+def run_length_encode(category_map):
+    """serialize a category map as bytes with the runs of equal categories
+    along the rows. The bytes hold the shape, the number of runs, the
+    category of every run and the uint32 length of every run
+    """
+    category_map = np.ascontiguousarray(category_map, dtype=np.uint8)
+    flat = category_map.ravel()
+
+    # the start of every run
+    starts = np.flatnonzero(np.diff(flat, prepend=~flat[:1]))
+    lengths = np.diff(np.append(starts, flat.size)).astype("<u4")
+    values = flat[starts]
+
+    return b"".join(
+        [
+            _PREFIX.pack(MAGIC, category_map.ndim),
+            np.array(category_map.shape + (starts.size,), dtype="<u8").tobytes(),
+            values.tobytes(),
+            lengths.tobytes(),
+        ]
+    )
+
+
+def run_length_decode(data):
+    """get the category map back from the bytes of run_length_encode"""
+    magic, ndim = _PREFIX.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a run length encoded category map")
+
+    offset = _PREFIX.size
+    header = np.frombuffer(data, dtype="<u8", count=ndim + 1, offset=offset)
+    shape, runs = tuple(int(size) for size in header[:-1]), int(header[-1])
+    offset += header.nbytes
+
+    values = np.frombuffer(data, dtype=np.uint8, count=runs, offset=offset)
+    lengths = np.frombuffer(data, dtype="<u4", count=runs, offset=offset + runs)
+
+    return np.repeat(values, lengths).reshape(shape)
@@ -0,0 +1,254 @@
+"""
+This module converts category maps to polygons. The region of every
+category is traced with marching squares in the log10(u_gs), log10(u_ls)
+plane and simplified, so a map can be shipped as a few kilobytes of json or
+bytes. The polygons classify points on their own, without the velocity maps
+or the conditions, so this module only depends on numpy and config
+"""
+import json
+import struct
+
+import numpy as np
+
+from config import Config
+
+MAGIC = b"TPFP"
+VERSION = 1
+# magic, version, number of polygons, rings and points
+_PREFIX = struct.Struct("<4sBIII")
+
+
+def extract_polygons(category_map, u_gs, u_ls, tolerance=0.01):
+    """trace the regions of every category of a map calculated on the
+    velocity maps of generate_data.generate_velocity_maps.
+
+    The boundaries run halfway between the cells of different categories,
+    and half a cell outside of the edges of the map, and are simplified so
+    that they don't move more than tolerance decades.
+    Returns a list of (category, rings) polygons, where rings is a list of
+    closed (n, 2) arrays of log10(u_gs), log10(u_ls) points: the outline
+    followed by the holes
+    """
+    # only needed here, so it is imported when it is used
+    import contourpy
+
+    category_map = np.asarray(category_map)
+    log_u_gs = np.log10(np.asarray(u_gs)[0, :])
+    log_u_ls = np.log10(np.asarray(u_ls)[:, 0])
+
+    # a border outside of every category closes the regions at the edges
+    # of the map, halfway to the border like between the categories
+    x = np.pad(log_u_gs, 1, mode="reflect", reflect_type="odd")
+    y = np.pad(log_u_ls, 1, mode="reflect", reflect_type="odd")
+    padded_map = np.pad(category_map, 1, constant_values=Config.NO_CATEGORY)
+
+    polygons = []
+    for category, value in Config.CATEGORIES.items():
+        layer = padded_map == value
+        if not np.any(layer):
+            continue
+        generator = contourpy.contour_generator(
+            x, y, layer.astype(float), fill_type=contourpy.FillType.OuterOffset
+        )
+        for points, offsets in zip(*generator.filled(0.5, 1.5)):
+            rings = [
+                simplify(points[start:stop], tolerance)
+                for start, stop in zip(offsets[:-1], offsets[1:])
+            ]
+            # rings that collapsed to a line are dropped, and so are
+            # polygons with a collapsed outline
+            if len(rings[0]) >= 4:
+                polygons.append(
+                    (
+                        category,
+                        [rings[0]] + [ring for ring in rings[1:] if len(ring) >= 4],
+                    )
+                )
+    return polygons
+
+
+def simplify(ring, tolerance):
+    """simplify a closed ring with the douglas peucker algorithm, keeping
+    every point that is more than tolerance away from the simplified ring
+    """
+    ring = np.asarray(ring, dtype=float)
+    if len(ring) < 4 or tolerance <= 0:
+        return ring
+
+    # the ring is split at its first point and at the point farthest from
+    # it, so that both halves have distinct end points
+    farthest = int(np.argmax(np.sum((ring - ring[0]) ** 2, axis=1)))
+    keep = np.zeros(len(ring), dtype=bool)
+    keep[[0, farthest, len(ring) - 1]] = True
+
+    stack = [(0, farthest), (farthest, len(ring) - 1)]
+    while stack:
+        start, stop = stack.pop()
+        if stop - start < 2:
+            continue
+        # the distances of the points in between to the segment
+        segment = ring[stop] - ring[start]
+        offsets = ring[start + 1 : stop] - ring[start]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = (
+                np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+            )
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            middle = start + 1 + index
+            keep[middle] = True
+            stack.extend([(start, middle), (middle, stop)])
+
+    return ring[keep]
+
+
+def polygons_to_json(polygons, decimals=6):
+    """serialize polygons to a json string, with the coordinates rounded to
+    decimals
+    """
+    return json.dumps(
+        {
+            "version": VERSION,
+            "polygons": [
+                {
+                    "category": category,
+                    "rings": [np.round(ring, decimals).tolist() for ring in rings],
+                }
+                for category, rings in polygons
+            ],
+        },
+        separators=(",", ":"),
+    )
+
+
+def polygons_from_json(text):
+    """get the polygons back from the json of polygons_to_json"""
+    data = json.loads(text)
+    if data["version"] != VERSION:
+        raise ValueError(f"unsupported polygons version {data['version']}")
+    return [
+        (
+            polygon["category"],
+            [np.array(ring, dtype=float) for ring in polygon["rings"]],
+        )
+        for polygon in data["polygons"]
+    ]
+
+
+def polygons_to_bytes(polygons):
+    """serialize polygons as bytes: the category and number of rings of
+    every polygon, the number of points of every ring and the float32
+    coordinates of all the points
+    """
+    rings = [ring for _, polygon_rings in polygons for ring in polygon_rings]
+    points = np.concatenate(rings) if rings else np.empty((0, 2))
+    return b"".join(
+        [
+            _PREFIX.pack(MAGIC, VERSION, len(polygons), len(rings), len(points)),
+            np.array(
+                [Config.CATEGORIES[category] for category, _ in polygons],
+                dtype=np.uint8,
+            ).tobytes(),
+            np.array([len(rings) for _, rings in polygons], dtype="<u4").tobytes(),
+            np.array([len(ring) for ring in rings], dtype="<u4").tobytes(),
+            points.astype("<f4").tobytes(),
+        ]
+    )
+
+
+def polygons_from_bytes(data):
+    """get the polygons back from the bytes of polygons_to_bytes"""
+    magic, version, n_polygons, n_rings, n_points = _PREFIX.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not serialized polygons")
+    if version != VERSION:
+        raise ValueError(f"unsupported polygons version {version}")
+
+    offset = _PREFIX.size
+    values = np.frombuffer(data, dtype=np.uint8, count=n_polygons, offset=offset)
+    offset += values.nbytes
+    ring_counts = np.frombuffer(data, dtype="<u4", count=n_polygons, offset=offset)
+    offset += ring_counts.nbytes
+    point_counts = np.frombuffer(data, dtype="<u4", count=n_rings, offset=offset)
+    offset += point_counts.nbytes
+    points = np.frombuffer(data, dtype="<f4", count=2 * n_points, offset=offset)
+    points = points.reshape(-1, 2).astype(float)
+
+    categories = {value: category for category, value in Config.CATEGORIES.items()}
+    rings = np.split(points, np.cumsum(point_counts, dtype=int)[:-1]) if n_rings else []
+    ring_starts = np.concatenate([[0], np.cumsum(ring_counts)]).astype(int)
+    return [
+        (categories[value], rings[ring_starts[index] : ring_starts[index + 1]])
+        for index, value in enumerate(values)
+    ]
+
+
+class PolygonClassifier:
+    """
+    classifies operating points from the polygons of a map alone. A point
+    belongs to a polygon if it is inside of an odd number of its rings.
+    The points are tested against the edges in chunks of about chunk_elements
+    point-edge pairs
+    """
+
+    def __init__(self, polygons, chunk_elements=2 ** 20):
+        self.chunk_elements = chunk_elements
+        self.polygons = []
+        for category, rings in polygons:
+            # the edges of all the rings of the polygon, from a to b
+            start = np.concatenate([ring[:-1] for ring in rings])
+            stop = np.concatenate([ring[1:] for ring in rings])
+            points = np.concatenate(rings)
+            self.polygons.append(
+                (
+                    Config.CATEGORIES[category],
+                    start,
+                    stop,
+                    points.min(axis=0),
+                    points.max(axis=0),
+                )
+            )
+
+    def classify(self, u_gs, u_ls):
+        """get the uint8 categories of the points, Config.NO_CATEGORY for
+        the points outside of every polygon
+        """
+        u_gs, u_ls = np.broadcast_arrays(
+            np.asarray(u_gs, dtype=float), np.asarray(u_ls, dtype=float)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x, y = np.log10(u_gs).ravel(), np.log10(u_ls).ravel()
+        categories = np.full(x.size, Config.NO_CATEGORY, dtype=np.uint8)
+
+        for value, start, stop, low, high in self.polygons:
+            # only the unclassified points in the bounding box are tested
+            candidates = np.flatnonzero(
+                (categories == Config.NO_CATEGORY)
+                & (x >= low[0])
+                & (x <= high[0])
+                & (y >= low[1])
+                & (y <= high[1])
+            )
+            chunk_size = max(1, self.chunk_elements // len(start))
+            for first in range(0, candidates.size, chunk_size):
+                chunk = candidates[first : first + chunk_size]
+                inside = _inside(x[chunk], y[chunk], start, stop)
+                categories[chunk[inside]] = value
+
+        return categories.reshape(u_gs.shape)
+
+
+def _inside(x, y, start, stop):
+    """even odd rule of the points against the edges, by casting a ray in
+    the +x direction from every point
+    """
+    x, y = x[:, np.newaxis], y[:, np.newaxis]
+    straddles = (start[:, 1] > y) != (stop[:, 1] > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing = start[:, 0] + (y - start[:, 1]) * (stop[:, 0] - start[:, 0]) / (
+            stop[:, 1] - start[:, 1]
+        )
+    return np.count_nonzero(straddles & (x < crossing), axis=1) % 2 == 1
@@ -6,149 +6,377 @@ import numpy as np
 
 from config import Config
 from conditions import annular, bubbly, dispersed_bubbles, stratified, intermittent
+from evaluation import EvaluationContext
+import fluids
+from instrumentation import activate, stage
+from workspace import default_workspace
 
 
-def parse_bubbly(u_gs, u_ls, liquid, gas, pipe):
+def parse_bubbly(u_gs, u_ls, liquid, gas, pipe, context=None):
     """
     parse the conditions of the bubbly maps
     """
-    # check if bubbly flow can exist
-    if bubbly.taylor_velocity_exceeds(
+    # check if bubbly flow can exist, for every scenario
+    bubbly_possible = bubbly.taylor_velocity_exceeds(
         liquid, gas, pipe
-    ) and bubbly.angle_prevents_bubble_migration(liquid, gas, pipe):
-        # if it exists calculate it
-        gas_void_fraction_bubbly_map = bubbly.gas_void_fraction(
-            u_gs, u_ls, liquid, gas, pipe
-        )
-    else:
-        # otherwise the map is just full of False
-        gas_void_fraction_bubbly_map = np.full_like(u_gs, False, dtype=bool)
+    ) & bubbly.angle_prevents_bubble_migration(liquid, gas, pipe)
+
+    # where it exists calculate it, otherwise the map is just full of False
+    gas_void_fraction_bubbly_map = (
+        bubbly.gas_void_fraction(u_gs, u_ls, liquid, gas, pipe) & bubbly_possible
+    )
 
     return gas_void_fraction_bubbly_map
 
 
-def parse_dispersed_bubble(u_gs, u_ls, liquid, gas, pipe):
+def parse_dispersed_bubble(u_gs, u_ls, liquid, gas, pipe, context=None):
     """
     parse the conditions of the dispersed bubble maps
     """
+    if context is None:
+        context = EvaluationContext(u_gs, u_ls, liquid, gas, pipe)
+
     # get dispersed bubble flow conditions
     gas_void_frac_dispersed_map = dispersed_bubbles.gas_void_fraction(u_gs, u_ls)
     coalescence_map = dispersed_bubbles.bubble_coalescence(
-        u_gs, u_ls, liquid, gas, pipe
+        u_gs, u_ls, liquid, gas, pipe, context=context
     )
 
     # get the correct locations for the gas void fract map
     # based on the coalescence map
 
     # find the maximum u_gs at which we need to
-    # consider both coalescence and void fraction
-    maximum_u_gs = u_gs[coalescence_map & gas_void_frac_dispersed_map].max()
+    # consider both coalescence and void fraction, for every map
+    if context.maximum_u_gs is None:
+        context.maximum_u_gs = np.max(
+            np.where(coalescence_map & gas_void_frac_dispersed_map, u_gs, -np.inf),
+            axis=context.map_axes,
+            keepdims=True,
+        )
+    maximum_u_gs = context.maximum_u_gs
 
     # all locations where dispersed bubbles can exist
-    bubble_map = np.full_like(coalescence_map, False)
-    bubble_map = gas_void_frac_dispersed_map
-    bubble_map[u_gs < maximum_u_gs] = (gas_void_frac_dispersed_map & coalescence_map)[
-        u_gs < maximum_u_gs
-    ]
+    bubble_map = np.where(
+        u_gs < maximum_u_gs,
+        gas_void_frac_dispersed_map & coalescence_map,
+        gas_void_frac_dispersed_map,
+    )
 
     return bubble_map
 
 
-def parse_stratified(u_gs, u_ls, liquid, gas, pipe):
+def parse_stratified(u_gs, u_ls, liquid, gas, pipe, context=None):
     """
     parse the conditions of the stratified region
     """
     # get stratified condition region
     stratified_equilibrium_map = stratified.equilibrium_equation(
-        u_gs, u_ls, liquid, gas, pipe
+        u_gs, u_ls, liquid, gas, pipe, context=context
     )
 
     # get the condition of transition into annular
     not_too_steep_map = ~stratified.too_steep_for_stratified(
-        u_gs, u_ls, liquid, gas, pipe
+        u_gs, u_ls, liquid, gas, pipe, context=context
     )
 
     stratified_map = stratified_equilibrium_map & not_too_steep_map
     return stratified_map
 
 
-def parse_annular(u_gs, u_ls, liquid, gas, pipe):
+def parse_annular(u_gs, u_ls, liquid, gas, pipe, context=None):
     """
     parse the conditions of the annular region
     """
 
     # get liquid stability condition
-    stability_map = annular.liquid_stability(u_gs, u_ls, liquid, gas, pipe)
+    stability_map = annular.liquid_stability(
+        u_gs, u_ls, liquid, gas, pipe, context=context
+    )
     # get core blockage condition
-    core_not_blocked_map = annular.gas_core_blockage(u_gs, u_ls, liquid, gas, pipe)
+    core_not_blocked_map = annular.gas_core_blockage(
+        u_gs, u_ls, liquid, gas, pipe, context=context
+    )
 
     annular_map = stability_map & core_not_blocked_map
 
     return annular_map
 
 
-def parse_elongated_bubble(u_gs, u_ls, liquid, gas, pipe):
+def parse_elongated_bubble(u_gs, u_ls, liquid, gas, pipe, context=None):
     """
     parse the elongated bubble condition map
     """
     elongated_bubble_map = intermittent.slug_free_of_bubbles(
-        u_gs, u_ls, liquid, gas, pipe
+        u_gs, u_ls, liquid, gas, pipe, context=context
     )
 
     return elongated_bubble_map
 
 
-def parse_churn(u_gs, u_ls, liquid, gas, pipe):
+def parse_churn(u_gs, u_ls, liquid, gas, pipe, context=None):
     """
     parse the slug flow condition condition map
     """
     elongated_bubble_map = intermittent.slug_full_of_bubbles(
-        u_gs, u_ls, liquid, gas, pipe
+        u_gs, u_ls, liquid, gas, pipe, context=context
     )
 
     return elongated_bubble_map
 
 
-def get_categories_maps(u_gs, u_ls, liquid, gas, pipe):
+def get_categories_maps(
+    u_gs, u_ls, liquid, gas, pipe, context=None, instrumentation=None, warm_start=None
+):
     """
     calls the other parsing functions to combine all parses into one
-    comprehensive map
+    comprehensive uint8 map of the values of Config.CATEGORIES, with
+    Config.NO_CATEGORY where no category applies. The parses share one
+    evaluation context, so the intermediate values they have in common are
+    only calculated once.
+
+    If the parameters of the fluids or pipe are arrays with one value per
+    scenario, the maps of all scenarios are calculated at once and returned
+    along a leading scenario axis.
+
+    Without a context, the intermediate values are written to the buffers of
+    the default workspace, which are reused by the next maps.
+
+    If an instrumentation.Instrumentation is supplied, the time of every
+    parse, the solves and the friction factors are reported to it.
+
+    For sweeps of scenarios that change in small steps, an
+    evaluation.WarmStart passed to the maps of every scenario in order
+    starts the solves of each map from the roots of the previous one. It is
+    only used without a context
     """
-    bubbly_map = parse_bubbly(u_gs, u_ls, liquid, gas, pipe)
-    bubble_map = parse_dispersed_bubble(u_gs, u_ls, liquid, gas, pipe)
-    stratified_map = parse_stratified(u_gs, u_ls, liquid, gas, pipe)
-    annular_map = parse_annular(u_gs, u_ls, liquid, gas, pipe)
-    elongated_bubble_map = parse_elongated_bubble(u_gs, u_ls, liquid, gas, pipe)
-    churn_map = parse_churn(u_gs, u_ls, liquid, gas, pipe)
+    with activate(instrumentation), stage("categories maps"):
+        category_map = _categories_maps(
+            u_gs, u_ls, liquid, gas, pipe, context, warm_start
+        )
+
+    if instrumentation is not None:
+        instrumentation.record(
+            "map",
+            points=int(category_map.size),
+            uncategorized=int(np.count_nonzero(category_map == Config.NO_CATEGORY)),
+        )
+    return category_map
 
-    # initialize a map with all zeros. Some maps are overlays on the actual map
-    category_map = np.full_like(u_ls, np.nan)
 
-    # colors will correspond to these numbers
-    # dispersed bubble is true regardless of other conditions
-    category_map[bubble_map] = Config.CATEGORIES["dispersed bubble"]
+def _categories_maps(u_gs, u_ls, liquid, gas, pipe, context, warm_start=None):
+    """the categories of get_categories_maps, with each parse as a stage"""
+    own_context = context is None
+    if own_context:
+        map_axes = None
+        if fluids.scenario_count(liquid, gas, pipe) is not None:
+            # the scenarios go along a new leading axis
+            liquid, gas, pipe = (
+                fluids.expand_scenarios(obj, np.ndim(u_gs))
+                for obj in (liquid, gas, pipe)
+            )
+            u_gs, u_ls = u_gs[np.newaxis, ...], u_ls[np.newaxis, ...]
+            map_axes = tuple(range(1, u_gs.ndim))
+
+        context = EvaluationContext(
+            u_gs,
+            u_ls,
+            liquid,
+            gas,
+            pipe,
+            map_axes=map_axes,
+            workspace=default_workspace(),
+            warm_start=warm_start,
+        )
 
-    # stratified
-    category_map[stratified_map & np.isnan(category_map)] = Config.CATEGORIES[
-        "stratified"
-    ]
+    try:
+        return _assign_categories(u_gs, u_ls, liquid, gas, pipe, context)
+    finally:
+        # the buffers go back to the workspace even if a parse fails
+        if own_context:
+            context.release()
+
+
+def _assign_categories(u_gs, u_ls, liquid, gas, pipe, context):
+    """assign the category of every parse to the map in order of priority"""
+    parses = {
+        "bubbly": parse_bubbly,
+        "dispersed bubble": parse_dispersed_bubble,
+        "stratified": parse_stratified,
+        "annular": parse_annular,
+        "elongated bubble": parse_elongated_bubble,
+        "churn": parse_churn,
+    }
+
+    def parse(name):
+        with stage(name):
+            return parses[name](u_gs, u_ls, liquid, gas, pipe, context)
+
+    def bubbly_present(bubbly_map):
+        if context.bubbly_present is None:
+            context.bubbly_present = np.any(
+                bubbly_map, axis=context.map_axes, keepdims=True
+            )
+        return context.bubbly_present
+
+    category_map = np.full(
+        np.broadcast_shapes(np.shape(u_gs), np.shape(u_ls)),
+        Config.NO_CATEGORY,
+        dtype=np.uint8,
+    )
+    # the parses are calculated one at a time as they are needed, so at
+    # most one of their maps is held alongside the category map
+    return _combine_in_priority(category_map, parse, bubbly_present)
 
-    # annular
-    category_map[annular_map & np.isnan(category_map)] = Config.CATEGORIES["annular"]
 
-    # if bubbly is possible and it then it is not an elongated bubble
-    if np.any(bubbly_map):
-        category_map[bubbly_map & np.isnan(category_map)] = Config.CATEGORIES["bubbly"]
-    else:
-        # elongated bubble
-        category_map[elongated_bubble_map & np.isnan(category_map)] = Config.CATEGORIES[
-            "elongated bubble"
-        ]
+def _combine_in_priority(category_map, parse, bubbly_present):
+    """add the condition maps to the category map in the order of priority
+    of the flow patterns. parse(name) gives the map of a parse and
+    bubbly_present(bubbly_map) if bubbly flow is possible
+    """
+    # dispersed bubble is true regardless of other conditions
+    for name in ["dispersed bubble", "stratified", "annular"]:
+        category_map = assign_category(category_map, parse(name), name)
+
+    # if bubbly is possible then it is not an elongated bubble
+    bubbly_map = parse("bubbly")
+    present = bubbly_present(bubbly_map)
+    category_map = assign_category(category_map, present & bubbly_map, "bubbly")
+    del bubbly_map
+    category_map = assign_category(
+        category_map, ~present & parse("elongated bubble"), "elongated bubble"
+    )
 
-    # slug flow
-    category_map[~churn_map & np.isnan(category_map)] = Config.CATEGORIES["slug"]
+    # slug or churn flow
+    churn_map = parse("churn")
+    category_map = assign_category(category_map, ~churn_map, "slug")
+    return assign_category(category_map, churn_map, "churn")
 
-    # churn flow
-    category_map[churn_map & np.isnan(category_map)] = Config.CATEGORIES["churn"]
 
+def assign_category(category_map, condition_map, category):
+    """
+    set the category on the points of the condition map that don't have a
+    category yet. The category map is expanded if the condition map has
+    more dimensions, e.g. for the scenarios
+    """
+    shape = np.broadcast_shapes(category_map.shape, np.shape(condition_map))
+    if shape != category_map.shape:
+        category_map = np.broadcast_to(category_map, shape).copy()
+
+    condition_map = np.broadcast_to(np.asarray(condition_map, dtype=bool), shape)
+    category_map[
+        condition_map & (category_map == Config.NO_CATEGORY)
+    ] = Config.CATEGORIES[category]
     return category_map
+
+
+def combine_categories(
+    bubble_map,
+    stratified_map,
+    annular_map,
+    bubbly_map,
+    elongated_bubble_map,
+    churn_map,
+    bubbly_present,
+):
+    """
+    combine the maps of each parse into one uint8 category map following
+    the priority of each flow pattern. bubbly_present can be given
+    for every map of the scenarios
+    """
+    maps = {
+        "dispersed bubble": bubble_map,
+        "stratified": stratified_map,
+        "annular": annular_map,
+        "bubbly": bubbly_map,
+        "elongated bubble": elongated_bubble_map,
+        "churn": churn_map,
+    }
+    category_map = np.full(
+        np.broadcast_shapes(np.shape(bubble_map), np.shape(bubbly_present)),
+        Config.NO_CATEGORY,
+        dtype=np.uint8,
+    )
+    return _combine_in_priority(
+        category_map, maps.__getitem__, lambda bubbly_map: bubbly_present
+    )
+
+
+def classify_points(u_gs, u_ls, liquid, gas, pipe):
+    """
+    classify scattered operating points given as 1D arrays of u_gs and u_ls.
+    The category of each point does not depend on the other points
+    in the batch. Like in get_categories_maps, the categories of the
+    scenarios of the fluids or pipe are returned along a leading axis
+    """
+    u_gs, u_ls = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(u_gs, dtype=float)),
+        np.atleast_1d(np.asarray(u_ls, dtype=float)),
+    )
+    # the points are independent, so they are classified as a 1D batch
+    shape = u_gs.shape
+    u_gs, u_ls = u_gs.ravel(), u_ls.ravel()
+    map_axes = None
+    if fluids.scenario_count(liquid, gas, pipe) is not None:
+        # the scenarios go along a new leading axis, like in _categories_maps
+        liquid, gas, pipe = (
+            fluids.expand_scenarios(obj, 1) for obj in (liquid, gas, pipe)
+        )
+        u_gs, u_ls = u_gs[np.newaxis, :], u_ls[np.newaxis, :]
+        map_axes = (1,)
+
+    context = batch_independent_context(
+        u_gs, u_ls, liquid, gas, pipe, map_axes=map_axes
+    )
+    category_map = get_categories_maps(u_gs, u_ls, liquid, gas, pipe, context=context)
+    return category_map.reshape(category_map.shape[:-1] + shape)
+
+
+def batch_independent_context(u_gs, u_ls, liquid, gas, pipe, map_axes=None):
+    """
+    get an evaluation context whose batch dependent values are found on the
+    configured map instead of on the batch of points. They are the same
+    values get_categories_maps finds on the map from
+    generate_data.generate_velocity_maps(). The points are along map_axes,
+    all of their axes by default, and the other axes are scenarios
+    """
+    ndim = np.ndim(u_gs)
+    if map_axes is None:
+        map_axes = tuple(range(ndim))
+    # the row of the map goes along the last axis of the points
+    u_gs_array = np.geomspace(
+        Config.MIN_UGS, Config.MAX_UGS, Config.NUMBER_DATAPOINTS
+    ).reshape((1,) * (ndim - 1) + (-1,))
+
+    # dispersed bubbles
+    # both conditions are met more easily at higher u_ls, so the maximum
+    # u_gs at which they are both met is found on the top row of the map
+    u_ls_row = np.full_like(u_gs_array, Config.MAX_ULS)
+    coalescence_row = dispersed_bubbles.bubble_coalescence(
+        u_gs_array, u_ls_row, liquid, gas, pipe
+    )
+    both_row = (
+        dispersed_bubbles.gas_void_fraction(u_gs_array, u_ls_row) & coalescence_row
+    )
+    maximum_u_gs = np.max(
+        np.where(both_row, u_gs_array, -np.inf), axis=map_axes, keepdims=True
+    )
+
+    # bubbly
+    # the void fraction condition is met most easily at the lowest u_gs
+    # and the highest u_ls of the map
+    bubbly_corner = parse_bubbly(
+        u_gs_array[..., :1], u_ls_row[..., :1], liquid, gas, pipe
+    )
+    # kept as a numpy bool array, so ~bubbly_present is its logical negation
+    bubbly_present = np.any(bubbly_corner, axis=map_axes, keepdims=True)
+
+    return EvaluationContext(
+        u_gs,
+        u_ls,
+        liquid,
+        gas,
+        pipe,
+        maximum_u_gs=maximum_u_gs,
+        bubbly_present=bubbly_present,
+        map_axes=map_axes,
+    )
@@ -0,0 +1,183 @@
+"""
+This module classifies live samples of the mass flowrates of a scenario.
+The category map of the scenario is calculated once, and every sample is
+looked up on it by its position on the logarithmic velocity axes, so the
+cost of a sample doesn't depend on the conditions
+"""
+import math
+
+import numpy as np
+
+from config import Config
+import generate_data
+import parse_maps
+
+
+class StreamingClassifier:
+    """
+    category map of a (liquid, gas, pipe) scenario that classifies samples
+    of (liquid mass flowrate, gas mass flowrate). The superficial velocities
+    of the samples are found like general.single_fluid_velocity, with the
+    densities and area of the scenario.
+
+    With hysteresis, the label only changes once a sample is at least
+    hysteresis map cells away from any other category, so samples moving
+    along a transition don't switch between the categories on either side.
+    A cell is (log10(max) - log10(min)) / (datapoints - 1) decades wide
+    """
+
+    def __init__(
+        self,
+        liquid,
+        gas,
+        pipe,
+        datapoints=Config.NUMBER_DATAPOINTS,
+        hysteresis=0,
+        min_u_ls=Config.MIN_ULS,
+        max_u_ls=Config.MAX_ULS,
+        min_u_gs=Config.MIN_UGS,
+        max_u_gs=Config.MAX_UGS,
+    ):
+        self.datapoints = datapoints
+        self.hysteresis = hysteresis
+
+        u_gs, u_ls = generate_data.generate_velocity_maps(
+            datapoints, min_u_ls, max_u_ls, min_u_gs, max_u_gs, sparse=True
+        )
+        with np.errstate(all="ignore"):
+            self.category_map = parse_maps.get_categories_maps(
+                u_gs, u_ls, liquid, gas, pipe
+            )
+        self.depth_map = interior_depth(self.category_map, hysteresis)
+
+        # the velocities of unit mass flowrates
+        self.u_ls_per_flowrate = float(1 / (liquid.density * pipe.area))
+        self.u_gs_per_flowrate = float(1 / (gas.density * pipe.area))
+
+        # the position of a velocity on the axes is
+        # (log10(velocity) - offset) * scale
+        self.u_gs_offset = math.log10(min_u_gs)
+        self.u_ls_offset = math.log10(min_u_ls)
+        self.u_gs_scale = (datapoints - 1) / (math.log10(max_u_gs) - self.u_gs_offset)
+        self.u_ls_scale = (datapoints - 1) / (math.log10(max_u_ls) - self.u_ls_offset)
+
+        # python lists are the fastest to index with single samples
+        self._categories = self.category_map.ravel().tolist()
+        self._depths = self.depth_map.ravel().tolist()
+        self._labels = {
+            value: category for category, value in Config.CATEGORIES.items()
+        }
+
+    def index(self, liquid_mass_flowrate, gas_mass_flowrate):
+        """the flat index of the map cell of a sample, or None if it is
+        outside of the map
+        """
+        try:
+            row = round(
+                (
+                    math.log10(liquid_mass_flowrate * self.u_ls_per_flowrate)
+                    - self.u_ls_offset
+                )
+                * self.u_ls_scale
+            )
+            column = round(
+                (
+                    math.log10(gas_mass_flowrate * self.u_gs_per_flowrate)
+                    - self.u_gs_offset
+                )
+                * self.u_gs_scale
+            )
+        except ValueError:
+            # zero or negative flowrates
+            return None
+        if 0 <= row < self.datapoints and 0 <= column < self.datapoints:
+            return row * self.datapoints + column
+        return None
+
+    def classify(self, liquid_mass_flowrate, gas_mass_flowrate):
+        """the category of a single sample, without hysteresis. None if it
+        is outside of the map or has no category
+        """
+        index = self.index(liquid_mass_flowrate, gas_mass_flowrate)
+        if index is None:
+            return None
+        return self._labels.get(self._categories[index])
+
+    def classify_many(self, liquid_mass_flowrates, gas_mass_flowrates):
+        """the uint8 categories of arrays of samples, without hysteresis.
+        Config.NO_CATEGORY outside of the map
+        """
+        with np.errstate(all="ignore"):
+            rows = np.rint(
+                (
+                    np.log10(np.asarray(liquid_mass_flowrates) * self.u_ls_per_flowrate)
+                    - self.u_ls_offset
+                )
+                * self.u_ls_scale
+            )
+            columns = np.rint(
+                (
+                    np.log10(np.asarray(gas_mass_flowrates) * self.u_gs_per_flowrate)
+                    - self.u_gs_offset
+                )
+                * self.u_gs_scale
+            )
+        inside = (
+            (rows >= 0)
+            & (rows < self.datapoints)
+            & (columns >= 0)
+            & (columns < self.datapoints)
+        )
+        categories = np.full(inside.shape, Config.NO_CATEGORY, dtype=np.uint8)
+        categories[inside] = self.category_map[
+            rows[inside].astype(int), columns[inside].astype(int)
+        ]
+        return categories
+
+    def stream(self, samples):
+        """yield the label of every (liquid mass flowrate, gas mass
+        flowrate) sample of an iterable, applying the hysteresis. Samples
+        outside of the map are labelled None and don't change the label of
+        the next samples
+        """
+        current = None
+        for liquid_mass_flowrate, gas_mass_flowrate in samples:
+            index = self.index(liquid_mass_flowrate, gas_mass_flowrate)
+            if index is None:
+                yield None
+                continue
+
+            category = self._categories[index]
+            if current is None or self._depths[index] >= self.hysteresis:
+                current = category
+            yield self._labels.get(current)
+
+
+def interior_depth(category_map, maximum):
+    """get the number of cells, up to maximum, that every cell of a
+    category map is away from the nearest cell of another category.
+    Cells outside of the map count as the same category
+    """
+    depth = np.zeros(category_map.shape, dtype=np.uint8)
+    # the cells whose square of radius depth has a single category
+    inside = np.ones(category_map.shape, dtype=bool)
+    for radius in range(1, maximum + 1):
+        padded_inside = np.pad(inside, 1, mode="edge")
+        padded_map = np.pad(category_map, 1, mode="edge")
+        rows, columns = category_map.shape
+        next_inside = inside.copy()
+        for shift_i in range(3):
+            for shift_j in range(3):
+                next_inside &= padded_inside[
+                    shift_i : shift_i + rows, shift_j : shift_j + columns
+                ]
+                if radius == 1:
+                    next_inside &= (
+                        padded_map[
+                            shift_i : shift_i + rows, shift_j : shift_j + columns
+                        ]
+                        == category_map
+                    )
+        inside = next_inside
+        depth[inside] = radius
+    return depth
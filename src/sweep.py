@@ -0,0 +1,110 @@
+"""
+This module runs sweeps of many scenarios, computing the category map of
+every scenario in parallel worker processes. The workers write the maps
+straight into a shared memory result cube, so the maps are never pickled
+"""
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import math
+from multiprocessing import shared_memory
+import os
+
+import numpy as np
+
+from evaluation import WarmStart
+import parse_maps
+
+# the scenarios per chunk of the warm started sweeps, fixed so that the
+# roots every scenario starts from don't depend on the number of workers
+WARM_START_CHUNKSIZE = 8
+
+# the state of each worker process, set by the initializer
+_worker = {}
+
+
+def product_scenarios(liquids, gases, pipes):
+    """get every combination of the liquids, gases and pipes as a list
+    of (liquid, gas, pipe) scenarios
+    """
+    return list(itertools.product(liquids, gases, pipes))
+
+
+def sweep_maps(
+    u_gs, u_ls, scenarios, max_workers=None, chunksize=None, warm_start=False
+):
+    """calculate the category maps of every (liquid, gas, pipe) scenario.
+
+    The scenarios are split into chunks of consecutive scenarios which are
+    scheduled on max_workers processes. The maps are returned in the order
+    of the scenarios as an (n_scenarios, n_uls, n_ugs) array
+
+    If warm_start, the solves of every scenario start from the converged
+    roots of the previous scenario of its chunk, which is much faster for
+    scenarios that change in small steps. The chunks then have
+    WARM_START_CHUNKSIZE scenarios unless chunksize is given, so the maps
+    don't depend on the machine or on max_workers. The maps are checked
+    against the ones calculated on their own by
+    benchmarks.benchmark_warm_start
+    """
+    scenarios = list(scenarios)
+    map_shape = np.broadcast_shapes(np.shape(u_gs), np.shape(u_ls))
+    shape = (len(scenarios),) + map_shape
+    dtype = np.dtype(np.uint8)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunksize is None and warm_start:
+        chunksize = WARM_START_CHUNKSIZE
+    elif chunksize is None:
+        # a few chunks per worker to balance the load
+        chunksize = max(1, math.ceil(len(scenarios) / (4 * max_workers)))
+
+    # the result cube
+    shared = shared_memory.SharedMemory(
+        create=True, size=max(1, math.prod(shape) * dtype.itemsize)
+    )
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_initialize_worker,
+            initargs=(shared.name, shape, dtype.str, u_gs, u_ls),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _compute_chunk,
+                    start,
+                    scenarios[start : start + chunksize],
+                    warm_start,
+                )
+                for start in range(0, len(scenarios), chunksize)
+            ]
+            for future in futures:
+                future.result()
+
+        category_maps = np.ndarray(shape, dtype=dtype, buffer=shared.buf).copy()
+    finally:
+        shared.close()
+        shared.unlink()
+
+    return category_maps
+
+
+def _initialize_worker(name, shape, dtype, u_gs, u_ls):
+    """attach the worker to the result cube and store the velocity maps"""
+    shared = shared_memory.SharedMemory(name=name)
+    _worker["shared"] = shared
+    _worker["result"] = np.ndarray(shape, dtype=dtype, buffer=shared.buf)
+    _worker["u_gs"] = u_gs
+    _worker["u_ls"] = u_ls
+
+
+def _compute_chunk(start, scenarios, warm_start=False):
+    """calculate the maps of a chunk of scenarios into the result cube, warm
+    starting every scenario from the previous one if warm_start
+    """
+    result = _worker["result"]
+    warm_start = WarmStart() if warm_start else None
+    for index, (liquid, gas, pipe) in enumerate(scenarios, start=start):
+        result[index] = parse_maps.get_categories_maps(
+            _worker["u_gs"], _worker["u_ls"], liquid, gas, pipe, warm_start=warm_start
+        )
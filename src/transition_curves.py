@@ -0,0 +1,204 @@
+"""
+This module traces the transition lines of each flow pattern condition
+directly, instead of classifying every point of a grid. The lines are
+found as the u_ls locations where each condition changes at a set of u_gs
+stations, and the category map is then built from them at any resolution
+"""
+import numpy as np
+
+from config import Config
+from evaluation import EvaluationContext
+import parse_maps
+
+# the conditions that are traced, in the order of parse_maps.combine_categories
+CONDITIONS = {
+    "dispersed bubble": parse_maps.parse_dispersed_bubble,
+    "stratified": parse_maps.parse_stratified,
+    "annular": parse_maps.parse_annular,
+    "bubbly": parse_maps.parse_bubbly,
+    "elongated bubble": parse_maps.parse_elongated_bubble,
+    "churn": parse_maps.parse_churn,
+}
+
+
+class TransitionCurves:
+    """
+    stores the transition lines of every condition as the log10(u_ls)
+    locations at which it changes at each u_gs station, plus if the
+    condition holds at the bottom of the map
+    """
+
+    def __init__(
+        self, u_gs_stations, u_ls_bounds, crossings, starts, context, evaluations
+    ):
+        self.u_gs_stations = u_gs_stations
+        self.u_ls_bounds = u_ls_bounds
+        # the log10(u_ls) crossings of every condition, padded with inf
+        self.crossings = crossings
+        # if each condition holds at the minimum u_ls of every station
+        self.starts = starts
+        # the context with the batch dependent values of the stations
+        self.context = context
+        # number of points at which the conditions were evaluated
+        self.evaluations = evaluations
+
+    def polylines(self, condition):
+        """get the transition lines of a condition as a list of (u_gs, u_ls)
+        polylines. Crossings of neighbouring stations are joined while the
+        number of crossings does not change
+        """
+        crossings = self.crossings[condition]
+        counts = np.isfinite(crossings).sum(axis=1)
+
+        lines = []
+        current = {}
+        for station, count in enumerate(counts):
+            if station == 0 or count != counts[station - 1]:
+                # a change in topology ends all the lines
+                lines.extend(current.values())
+                current = {k: [] for k in range(count)}
+            for k in range(count):
+                current[k].append((self.u_gs_stations[station], crossings[station, k]))
+        lines.extend(current.values())
+
+        return [
+            np.array([(u_gs, 10 ** log_u_ls) for u_gs, log_u_ls in line])
+            for line in lines
+            if len(line) > 0
+        ]
+
+    def condition_map(self, condition, u_gs_map, u_ls_map):
+        """rasterize the map of a condition on the velocity maps. The crossings
+        are interpolated between stations where the lines are continuous,
+        otherwise the closest station is used
+        """
+        x_values = np.log10(u_gs_map[0, :])
+        y_values = np.log10(u_ls_map[:, 0])
+        crossings = self.crossings[condition]
+        starts = self.starts[condition]
+        counts = np.isfinite(crossings).sum(axis=1)
+
+        # the position of each column between the stations
+        stations = np.log10(self.u_gs_stations)
+        position = np.interp(x_values, stations, np.arange(stations.size))
+        left = np.clip(np.floor(position).astype(int), 0, stations.size - 2)
+        weight = position - left
+        right = left + 1
+
+        # interpolate where the lines are continuous
+        continuous = (counts[left] == counts[right]) & (starts[left] == starts[right])
+        closest = np.where(weight < 0.5, left, right)
+        column_crossings = np.where(
+            continuous[:, np.newaxis],
+            (1 - weight[:, np.newaxis]) * crossings[left]
+            + weight[:, np.newaxis] * crossings[right],
+            crossings[closest],
+        )
+        # inf - inf padding
+        column_crossings[np.isnan(column_crossings)] = np.inf
+        column_starts = np.where(continuous, starts[left], starts[closest])
+
+        # the condition flips at every crossing below the point
+        crossed = (
+            column_crossings[np.newaxis, :, :] < y_values[:, np.newaxis, np.newaxis]
+        ).sum(axis=2)
+        return column_starts[np.newaxis, :] ^ (crossed % 2 == 1)
+
+    def category_map(self, u_gs_map, u_ls_map):
+        """rasterize the category map on the velocity maps by combining
+        the transition lines with the priority of each flow pattern
+        """
+        maps = [
+            self.condition_map(condition, u_gs_map, u_ls_map)
+            for condition in CONDITIONS
+        ]
+        return parse_maps.combine_categories(*maps, self.context.bubbly_present)
+
+
+def trace_transitions(
+    liquid,
+    gas,
+    pipe,
+    stations=200,
+    scan_points=32,
+    tolerance=1e-4,
+    min_u_ls=Config.MIN_ULS,
+    max_u_ls=Config.MAX_ULS,
+    min_u_gs=Config.MIN_UGS,
+    max_u_gs=Config.MAX_UGS,
+):
+    """find the transition lines of every condition at each u_gs station.
+
+    Each station is scanned at scan_points u_ls values to bracket the
+    transitions, which are then bisected down to tolerance in log10(u_ls).
+    Transitions closer to each other than the scan spacing may be missed
+    """
+    u_gs_stations = np.geomspace(min_u_gs, max_u_gs, num=stations)
+    log_u_ls = np.linspace(np.log10(min_u_ls), np.log10(max_u_ls), num=scan_points)
+
+    # scan all the stations on a coarse grid, which also sets the
+    # batch dependent values of the conditions
+    u_gs_map = np.tile(u_gs_stations, (scan_points, 1))
+    u_ls_map = np.tile(10 ** log_u_ls, (stations, 1)).T
+    context = EvaluationContext(u_gs_map, u_ls_map, liquid, gas, pipe)
+    scans = {
+        condition: parse(u_gs_map, u_ls_map, liquid, gas, pipe, context)
+        for condition, parse in CONDITIONS.items()
+    }
+    if context.bubbly_present is None:
+        context.bubbly_present = np.any(scans["bubbly"])
+
+    crossings = {}
+    starts = {}
+    evaluations = u_gs_map.size
+    for condition, parse in CONDITIONS.items():
+        scan = scans[condition]
+
+        # bracket every change of the condition along u_ls
+        row, station = np.nonzero(scan[1:, :] != scan[:-1, :])
+        lower = log_u_ls[row]
+        upper = log_u_ls[row + 1]
+        lower_value = scan[row, station]
+
+        # bisect all brackets at once
+        while np.any(upper - lower > tolerance):
+            middle = (lower + upper) / 2
+            middle_value = _evaluate(
+                parse, u_gs_stations[station], 10 ** middle, liquid, gas, pipe, context
+            )
+            evaluations += middle.size
+            same = middle_value == lower_value
+            lower = np.where(same, middle, lower)
+            upper = np.where(same, upper, middle)
+
+        # store the crossings of each station sorted and padded with inf
+        count = np.bincount(station, minlength=stations)
+        condition_crossings = np.full((stations, max(count.max(initial=0), 1)), np.inf)
+        order = np.lexsort(((lower + upper) / 2, station))
+        rank = np.arange(order.size) - np.repeat(np.cumsum(count) - count, count)
+        condition_crossings[station[order], rank] = ((lower + upper) / 2)[order]
+
+        crossings[condition] = condition_crossings
+        starts[condition] = scan[0, :].copy()
+
+    return TransitionCurves(
+        u_gs_stations, (min_u_ls, max_u_ls), crossings, starts, context, evaluations
+    )
+
+
+def _evaluate(parse, u_gs, u_ls, liquid, gas, pipe, context):
+    """evaluate one condition at scattered points with the batch
+    dependent values of the stations
+    """
+    point_context = EvaluationContext(
+        u_gs[np.newaxis, :],
+        u_ls[np.newaxis, :],
+        liquid,
+        gas,
+        pipe,
+        maximum_u_gs=context.maximum_u_gs,
+        bubbly_present=context.bubbly_present,
+    )
+    return parse(
+        point_context.u_gs, point_context.u_ls, liquid, gas, pipe, point_context
+    )[0]
@@ -0,0 +1,130 @@
+"""
+This module finds how far operating points are from the nearest transition
+of a category map. The boundary points between cells of different
+categories are found once with generate_data.detect_edges and put in a
+KD-tree, so every query is a nearest neighbour search in the log10 velocity
+plane
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from config import Config
+import generate_data
+import parse_maps
+
+Margin = namedtuple("Margin", ["distance", "u_gs", "u_ls", "categories"])
+
+
+class TransitionIndex:
+    """
+    spatial index of the transitions of a category map calculated on the
+    velocity maps of generate_data.generate_velocity_maps. The boundary
+    points are the midpoints between neighbouring cells with different
+    categories, in log10 velocities, so distances are in decades
+    """
+
+    def __init__(self, category_map, u_gs, u_ls):
+        category_map = np.asarray(category_map)
+        log_u_gs = np.log10(np.asarray(u_gs)[0, :])
+        log_u_ls = np.log10(np.asarray(u_ls)[:, 0])
+
+        # the cells that differ from their previous neighbour in either
+        # direction, and the neighbour they differ from
+        edges = generate_data.detect_edges(category_map) > 0
+        rows, columns = np.nonzero(edges)
+        points, pairs = [], []
+        for step_row, step_column in [(1, 0), (0, 1)]:
+            previous_rows = rows - step_row
+            previous_columns = columns - step_column
+            valid = (previous_rows >= 0) & (previous_columns >= 0)
+            row, column = rows[valid], columns[valid]
+            previous_row, previous_column = (
+                previous_rows[valid],
+                previous_columns[valid],
+            )
+
+            category = category_map[row, column]
+            previous_category = category_map[previous_row, previous_column]
+            differs = category != previous_category
+
+            points.append(
+                np.column_stack(
+                    [
+                        (log_u_gs[column] + log_u_gs[previous_column])[differs] / 2,
+                        (log_u_ls[row] + log_u_ls[previous_row])[differs] / 2,
+                    ]
+                )
+            )
+            # the pair in ascending order, so both sides of a transition
+            # have the same pair
+            pairs.append(
+                np.sort(
+                    np.column_stack([category[differs], previous_category[differs]]),
+                    axis=1,
+                )
+            )
+
+        self.points = np.concatenate(points)
+        self.pairs = np.concatenate(pairs).astype(np.uint8)
+        # the trees of every subset of the boundaries, built when queried
+        self._trees = {}
+
+    @classmethod
+    def from_scenario(cls, liquid, gas, pipe, datapoints=Config.NUMBER_DATAPOINTS):
+        """build the index of the map of a scenario"""
+        u_gs, u_ls = generate_data.generate_velocity_maps(
+            datapoints=datapoints, sparse=True
+        )
+        with np.errstate(all="ignore"):
+            category_map = parse_maps.get_categories_maps(u_gs, u_ls, liquid, gas, pipe)
+        return cls(category_map, u_gs, u_ls)
+
+    def query(self, u_gs, u_ls, category=None):
+        """find the nearest transition of every operating point. If a
+        category is given, only the transitions of that category count.
+
+        Returns a Margin with the distance in decades, the u_gs and u_ls of
+        the nearest boundary point and the pair of categories on either side
+        of it, inf, nan and Config.NO_CATEGORY if there is no transition
+        """
+        u_gs, u_ls = np.broadcast_arrays(
+            np.asarray(u_gs, dtype=float), np.asarray(u_ls, dtype=float)
+        )
+        tree, indices = self._tree(category)
+
+        distance = np.full(u_gs.shape, np.inf)
+        nearest_u_gs = np.full(u_gs.shape, np.nan)
+        nearest_u_ls = np.full(u_gs.shape, np.nan)
+        categories = np.full(u_gs.shape + (2,), Config.NO_CATEGORY, dtype=np.uint8)
+        if tree is None:
+            return Margin(distance, nearest_u_gs, nearest_u_ls, categories)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            queries = np.stack([np.log10(u_gs), np.log10(u_ls)], axis=-1)
+        valid = np.all(np.isfinite(queries), axis=-1)
+        found, nearest = tree.query(queries[valid])
+        nearest = indices[nearest]
+
+        distance[valid] = found
+        nearest_u_gs[valid] = 10 ** self.points[nearest, 0]
+        nearest_u_ls[valid] = 10 ** self.points[nearest, 1]
+        categories[valid] = self.pairs[nearest]
+        return Margin(distance, nearest_u_gs, nearest_u_ls, categories)
+
+    def _tree(self, category):
+        """the KD-tree of the boundaries of a category, or of all of them,
+        and the indices of its points in self.points
+        """
+        if category not in self._trees:
+            # only needed here, so it is imported when it is used
+            from scipy.spatial import cKDTree
+
+            if category is None:
+                indices = np.arange(len(self.points))
+            else:
+                value = Config.CATEGORIES[category]
+                indices = np.flatnonzero(np.any(self.pairs == value, axis=1))
+            tree = cKDTree(self.points[indices]) if indices.size else None
+            self._trees[category] = (tree, indices)
+        return self._trees[category]
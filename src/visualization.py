@@ -6,17 +6,26 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.lines as mlines
 from matplotlib.patches import Patch
+from matplotlib import ticker
 from scipy.ndimage import gaussian_filter
 
 from config import Config
 import general
 import generate_data
 
+# the maximum number of pixels per axis of the maps drawn as images
+RASTER_PIXELS = 1024
 
-def plot_map(category_map, liquid, gas, pipe, u_gs_map, u_ls_map):
+
+def plot_map(category_map, liquid, gas, pipe, u_gs_map, u_ls_map, raster=False):
     """
-    plot a map which contains the representation of a categorical map
+    plot a map which contains the representation of a categorical map.
+    If raster, it is drawn as a single image with plot_map_raster, which is
+    much faster for large maps
     """
+    if raster:
+        return plot_map_raster(category_map, liquid, gas, pipe, u_gs_map, u_ls_map)
+
     # initialize the figure
     fig, axs = plt.subplots(figsize=(7, 7))
 
@@ -37,18 +46,11 @@ def plot_map(category_map, liquid, gas, pipe, u_gs_map, u_ls_map):
     u_gs = general.single_fluid_velocity(gas, pipe)
     u_ls = general.single_fluid_velocity(liquid, pipe)
 
-    # get the legend
-    legend_elements = []
-    for category, value in Config.CATEGORIES.items():
-        if np.any(category_map == value):
-            color = list(Config.CMAP(value))
-            color[-1] = min(min_alpha * 3, 1)
-            legend_elements.append(Patch(facecolor=color, label=category))
-
+    # the points without a category are not drawn
     axs.pcolormesh(
         x_ticks,
         y_ticks,
-        category_map,
+        np.ma.masked_equal(category_map, Config.NO_CATEGORY),
         shading="gouraud",
         cmap=Config.CMAP,
         alpha=alphas,
@@ -56,21 +58,13 @@ def plot_map(category_map, liquid, gas, pipe, u_gs_map, u_ls_map):
 
     # the current value marker
     axs.plot(u_gs, u_ls, marker="x", color="black", mew=2, markersize=10)
-    legend_elements.append(
-        mlines.Line2D(
-            [],
-            [],
-            color="black",
-            marker="x",
-            mew=2,
-            linestyle="None",
-            markersize=10,
-            label="This scenario",
-        )
-    )
 
     # plot the legend
-    axs.legend(handles=legend_elements, bbox_to_anchor=(1.04, 1), loc="upper left")
+    axs.legend(
+        handles=legend_elements(category_map, min_alpha),
+        bbox_to_anchor=(1.04, 1),
+        loc="upper left",
+    )
 
     # set the ticks, label, title and scale
     axs.set_xticks(x_ticks)
@@ -83,3 +77,143 @@ def plot_map(category_map, liquid, gas, pipe, u_gs_map, u_ls_map):
     plt.tight_layout()
 
     return fig, axs
+
+
+def plot_map_raster(
+    category_map, liquid, gas, pipe, u_gs_map, u_ls_map, max_pixels=RASTER_PIXELS
+):
+    """
+    plot a categorical map as one image in log10 coordinates, with the
+    colors and the highlighted transitions of plot_map precomputed as RGBA.
+    Maps with more than max_pixels points per axis are drawn every few
+    points, since the figure can't show them anyway, so maps of several
+    megapixels render in under a second
+    """
+    fig, axs = plt.subplots(figsize=(7, 7))
+
+    step = raster_step(np.shape(category_map), max_pixels)
+    axs.imshow(
+        category_rgba(category_map, step=step),
+        origin="lower",
+        extent=log_extent(u_gs_map[0, ::step], u_ls_map[::step, 0]),
+        interpolation="nearest",
+        aspect="auto",
+    )
+    set_log_ticks(axs)
+
+    # the current value marker, in the log10 coordinates of the image
+    u_gs = general.single_fluid_velocity(gas, pipe)
+    u_ls = general.single_fluid_velocity(liquid, pipe)
+    axs.plot(
+        np.log10(u_gs),
+        np.log10(u_ls),
+        marker="x",
+        color="black",
+        mew=2,
+        markersize=10,
+    )
+    axs.legend(
+        handles=legend_elements(category_map),
+        bbox_to_anchor=(1.04, 1),
+        loc="upper left",
+    )
+
+    axs.set_xlabel(r"$U_{Gs}$")
+    axs.set_ylabel(r"$U_{Ls}$")
+    axs.set_title(f"Inclination = ${pipe.inclination*180/np.pi:.1f}{{\degree}}$")
+    plt.tight_layout()
+
+    return fig, axs
+
+
+def category_rgba(category_map, min_alpha=0.2, step=1):
+    """get the uint8 RGBA image of a category map every step points, with
+    the transitions opaque and the rest of the categories at min_alpha like
+    in plot_map. The transitions between the skipped points are kept, and
+    the points without a category are transparent
+    """
+    # the colors of every uint8 value
+    colors = np.zeros((256, 4), dtype=np.uint8)
+    values = list(Config.CATEGORIES.values())
+    colors[values] = np.round(Config.CMAP(values) * 255)
+
+    # the transitions stand out from the rest of the map
+    edges = generate_data.detect_edges(category_map).astype(np.float32)
+    if step > 1:
+        # a block has a transition if any of its points has one
+        for axis in range(2):
+            starts = np.arange(0, edges.shape[axis], step)
+            edges = np.maximum.reduceat(edges, starts, axis=axis)
+    alphas = gaussian_filter(edges, sigma=1)
+    if alphas.max() > 0:
+        alphas /= alphas.max()
+    np.maximum(alphas, min_alpha, out=alphas)
+
+    rgba = colors[category_map[::step, ::step]]
+    np.multiply(rgba[..., 3], alphas, out=rgba[..., 3], casting="unsafe")
+    return rgba
+
+
+def raster_step(shape, max_pixels=RASTER_PIXELS):
+    """the step between the points of a map of a shape drawn as an image of
+    at most max_pixels per axis
+    """
+    return max(1, -(-max(shape) // max_pixels))
+
+
+def log_extent(u_gs_axis, u_ls_axis):
+    """the extent of the image of a map on logarithmic velocity axes, in
+    log10 coordinates, with the points at the centers of the pixels
+    """
+    log_u_gs = np.log10([u_gs_axis[0], u_gs_axis[-1]])
+    log_u_ls = np.log10([u_ls_axis[0], u_ls_axis[-1]])
+    half_gs = (log_u_gs[1] - log_u_gs[0]) / max(len(u_gs_axis) - 1, 1) / 2
+    half_ls = (log_u_ls[1] - log_u_ls[0]) / max(len(u_ls_axis) - 1, 1) / 2
+    return [
+        log_u_gs[0] - half_gs,
+        log_u_gs[1] + half_gs,
+        log_u_ls[0] - half_ls,
+        log_u_ls[1] + half_ls,
+    ]
+
+
+def set_log_ticks(axs):
+    """label the log10 coordinates of the axes as powers of ten, with minor
+    ticks at the multiples of every decade
+    """
+    minor = np.log10(np.arange(2, 10))
+    for axis in [axs.xaxis, axs.yaxis]:
+        axis.set_major_locator(ticker.MultipleLocator(1))
+        axis.set_major_formatter(
+            ticker.FuncFormatter(lambda value, _: f"$10^{{{value:.0f}}}$")
+        )
+        lower, upper = np.floor(axis.get_view_interval())
+        decades = np.arange(min(lower, upper), max(lower, upper) + 1)
+        axis.set_minor_locator(
+            ticker.FixedLocator((decades[:, np.newaxis] + minor).ravel())
+        )
+
+
+def legend_elements(category_map, min_alpha=0.2):
+    """the legend patches of the categories in the map and the marker of the
+    scenario, like in plot_map
+    """
+    elements = []
+    for category, value in Config.CATEGORIES.items():
+        if np.any(category_map == value):
+            color = list(Config.CMAP(value))
+            color[-1] = min(min_alpha * 3, 1)
+            elements.append(Patch(facecolor=color, label=category))
+    elements.append(
+        mlines.Line2D(
+            [],
+            [],
+            color="black",
+            marker="x",
+            mew=2,
+            linestyle="None",
+            markersize=10,
+            label="This scenario",
+        )
+    )
+    return elements
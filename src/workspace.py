@@ -0,0 +1,94 @@
+"""
+This module keeps a pool of preallocated arrays, so that the intermediate
+arrays of a map computation are reused by the following conditions and by
+the following map computations instead of being allocated every time
+"""
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from config import Config
+
+
+class Workspace:
+    """
+    pool of arrays by shape and dtype. Arrays taken with empty are owned by
+    the workspace and can be given back with release once they are not used
+    anymore. The pool is not thread safe, every thread needs its own.
+
+    If max_bytes is given, the released arrays are kept up to max_bytes,
+    dropping the arrays of the shapes that were used the longest ago first,
+    so the pool doesn't grow with every map size that was ever computed
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        # the released arrays of every (shape, dtype), the most recently
+        # used last
+        self._free = OrderedDict()
+        # the arrays that were allocated by the workspace, by id
+        self._owned = {}
+
+    @property
+    def nbytes(self):
+        """the memory held by the workspace"""
+        return sum(array.nbytes for array in self._owned.values())
+
+    @property
+    def free_nbytes(self):
+        """the memory of the released arrays held by the workspace"""
+        return sum(array.nbytes for free in self._free.values() for array in free)
+
+    def empty(self, shape, dtype=float):
+        """get an uninitialized array, reusing a released one if possible"""
+        shape = (shape,) if np.isscalar(shape) else tuple(shape)
+        dtype = np.dtype(dtype)
+        free = self._free.get((shape, dtype))
+        if free:
+            self._free.move_to_end((shape, dtype))
+            return free.pop()
+        array = np.empty(shape, dtype=dtype)
+        self._owned[id(array)] = array
+        return array
+
+    def release(self, *arrays):
+        """give arrays back to the pool. Arrays that the workspace doesn't
+        own, like views or results of other calculations, are ignored
+        """
+        for array in arrays:
+            if isinstance(array, np.ndarray) and self._owned.get(id(array)) is array:
+                key = (array.shape, array.dtype)
+                free = self._free.setdefault(key, [])
+                self._free.move_to_end(key)
+                if not any(array is other for other in free):
+                    free.append(array)
+        if self.max_bytes is not None:
+            self._trim(self.max_bytes)
+
+    def _trim(self, max_bytes):
+        """drop released arrays, the least recently used shapes first,
+        until they take at most max_bytes
+        """
+        free_nbytes = self.free_nbytes
+        while free_nbytes > max_bytes and self._free:
+            key, free = next(iter(self._free.items()))
+            if not free:
+                del self._free[key]
+                continue
+            array = free.pop()
+            del self._owned[id(array)]
+            free_nbytes -= array.nbytes
+
+    def clear(self):
+        """drop every array of the pool"""
+        self._free.clear()
+        self._owned.clear()
+
+
+@lru_cache(maxsize=None)
+def default_workspace():
+    """the workspace shared by the map computations of this process, which
+    keeps up to Config.WORKSPACE_MAX_BYTES of released arrays
+    """
+    return Workspace(Config.WORKSPACE_MAX_BYTES)